@@ -0,0 +1,275 @@
+"""Benchmarks for parsing, rendering and navigating decks.
+
+Generates synthetic decks of a few sizes, then measures, for each of
+``core.Deck`` and ``hairy.Deck``:
+
+* ``parse`` - ``Deck.from_path`` with the deck cache off
+* ``banner`` - ``Slide._banner()`` for every slide
+* ``highlight`` - ``_highlight_text()`` for every codeblock, cold cache
+* ``goto_fwd`` / ``goto_back`` - ``!goto`` from the first slide to the
+  last and back again
+* ``peak_kb`` - peak memory allocated while parsing
+
+Each timing is the best and median of several runs, with the garbage
+collector off while timing.  Save a run with ``--json`` and compare a
+later one against it with ``--compare``::
+
+    python bench/bench_deck.py --json before.json
+    python bench/bench_deck.py --compare before.json
+
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+from pathlib import Path
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sliderepl import core  # noqa: E402
+
+try:
+    from sliderepl import hairy
+except ImportError:
+    hairy = None
+
+SIZES = {"small": 20, "medium": 200, "large": 2000}
+
+_code = '''\
+def func_{n}(a, b=2):
+    """Return something from {n}."""
+    result = []
+    for i in range(a):
+        if i % b:
+            result.append(i * {n})
+        else:
+            result.append("!!{{bold}}")
+    return result
+
+data_{n} = {{"key": [1, 2, 3], "other": (4, 5)}}
+total_{n} = sum(len(func_{n}(x)) for x in range(3))
+'''
+
+
+def _slide(n: int) -> str:
+    flags = "b" if n % 3 == 0 else ""
+    lines = [
+        f"### slide::{flags}",
+        f"### title:: Slide !!{{bullet}}{n}!!{{reset}} of the "
+        f"!!{{codebullet}}synthetic!!{{reset}} deck",
+        f"# intro line with !!{{bullet}}markup!!{{reset}} for slide {n}",
+        "# a second, plainer intro line",
+    ]
+    if flags:
+        lines += [
+            f"###   * a bullet with **bold** and ``code`` text, long "
+            f"enough that it wraps past the bullet width, slide {n}",
+            "###   * another !!{codebullet}styled!!{reset} bullet",
+        ]
+    lines += ["", _code.format(n=n), f"total_{n}", ""]
+    return "\n".join(lines)
+
+
+def generate(directory: Path, count: int, includes: int = 4) -> Path:
+    """Write a deck of ``count`` slides, split across a chain of
+    ``### file::`` includes, returning the path of the main file."""
+
+    per_file = max(1, count // (includes + 1))
+    chunks = [
+        range(start, min(start + per_file, count))
+        for start in range(0, count, per_file)
+    ]
+    paths = [directory / f"part_{idx}.py" for idx in range(len(chunks))]
+
+    for idx, (path, chunk) in enumerate(zip(paths, chunks)):
+        text = []
+        if idx == 0:
+            text.append("### slide::s\nimport os\n")
+        text.extend(_slide(n) for n in chunk)
+        if idx + 1 < len(paths):
+            # the line after an include is swallowed by the parser
+            text.append(f"### file:: {paths[idx + 1].name}\n")
+        else:
+            text.append("### slide::\n")
+        path.write_text("\n".join(text))
+    return paths[0]
+
+
+def _timed(fn, setup=None, repeat=5):
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - start)
+        finally:
+            gc.enable()
+    return {"best": min(times), "median": statistics.median(times)}
+
+
+def _parse(deck_cls, path):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return deck_cls.from_path(path, no_cache=True, color="dark")
+
+
+def _session(deck):
+    core.environ = {"__name__": "__console__", "__doc__": None}
+    deck.setup_environ(core.environ)
+    if deck.init_slide:
+        for _, co in deck.init_slide.codeblocks:
+            exec(co, core.environ)
+    deck.current = 0
+
+
+def bench(deck_cls, path, repeat):
+    results = {}
+
+    results["parse"] = _timed(lambda: _parse(deck_cls, path), repeat=repeat)
+
+    tracemalloc.start()
+    deck = _parse(deck_cls, path)
+    results["peak_kb"] = tracemalloc.get_traced_memory()[1] // 1024
+    tracemalloc.stop()
+
+    def banners():
+        for slide in deck.slides:
+            slide._banner()
+
+    results["banner"] = _timed(banners, repeat=repeat)
+
+    texts = [
+        "".join(display) for slide in deck.slides for display in slide.displays
+    ]
+
+    def highlight():
+        for text in texts:
+            deck._highlight_text(text)
+
+    def clear_highlight():
+        if hairy is not None:
+            hairy._highlighted.cache_clear()
+
+    results["highlight"] = _timed(
+        highlight, setup=clear_highlight, repeat=repeat
+    )
+
+    last = len(deck.slides)
+    with contextlib.redirect_stdout(io.StringIO()):
+        stdin = sys.stdin
+        # slides with bullets wait on input() before their code
+        sys.stdin = io.StringIO("\n" * (last * 4))
+        try:
+
+            def reset():
+                _session(deck)
+                deck._frames.clear()
+
+            results["goto_fwd"] = _timed(
+                lambda: deck.goto(last), setup=reset, repeat=repeat
+            )
+
+            def at_end():
+                reset()
+                deck.goto(last)
+                deck._frames.clear()
+
+            results["goto_back"] = _timed(
+                lambda: deck.goto(1), setup=at_end, repeat=repeat
+            )
+        finally:
+            sys.stdin = stdin
+
+    return results
+
+
+def _report(results, baseline=None):
+    print(
+        "%-8s %-6s %-10s %12s %12s %9s"
+        % ("size", "deck", "benchmark", "best", "median", "vs base")
+    )
+    for key, value in results.items():
+        size, deck = key.split("/")
+        for name, numbers in value.items():
+            base = (baseline or {}).get(key, {}).get(name)
+            if name == "peak_kb":
+                best, median = "%d KB" % numbers, ""
+                ratio = numbers / base if base else None
+            else:
+                best = "%.3f ms" % (numbers["best"] * 1000)
+                median = "%.3f ms" % (numbers["median"] * 1000)
+                ratio = numbers["best"] / base["best"] if base else None
+            print(
+                "%-8s %-6s %-10s %12s %12s %9s"
+                % (
+                    size,
+                    deck,
+                    name,
+                    best,
+                    median,
+                    "%.2fx" % ratio if ratio else "",
+                )
+            )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument(
+        "--sizes",
+        nargs="+",
+        choices=list(SIZES),
+        default=list(SIZES),
+        help="deck sizes to run",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=5, help="runs of each benchmark"
+    )
+    parser.add_argument("--json", metavar="PATH", help="save results")
+    parser.add_argument(
+        "--compare", metavar="PATH", help="compare with saved results"
+    )
+    options = parser.parse_args(argv)
+
+    decks = [("core", core.Deck)]
+    if hairy is not None:
+        decks.append(("hairy", hairy.Deck))
+    else:
+        print("pygments / termcolor aren't installed; skipping hairy.Deck")
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["SLIDEREPL_CACHE_DIR"] = tmp
+        for size in options.sizes:
+            directory = Path(tmp) / size
+            directory.mkdir()
+            path = generate(directory, SIZES[size])
+            for name, deck_cls in decks:
+                results[f"{size}/{name}"] = bench(
+                    deck_cls, path, options.repeat
+                )
+
+    baseline = None
+    if options.compare:
+        with open(options.compare) as fh:
+            baseline = json.load(fh)
+    _report(results, baseline)
+
+    if options.json:
+        with open(options.json, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
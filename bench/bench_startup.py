@@ -0,0 +1,219 @@
+"""Benchmark of sliderepl start up time.
+
+Measures, each in a fresh interpreter:
+
+* ``import`` - ``import sliderepl.main``, as reported by ``-X importtime``
+* ``script`` - ``sliderepl deck.py --run-all`` of a one slide deck
+* ``menu`` - showing the chapter menu and quitting
+
+``script`` and ``menu`` run under a pseudo terminal where there is one,
+so they take the same path as an interactive session.  ``--top`` lists
+the slowest imports, to see what start up is spending its time on.
+``--compare`` against a saved ``--json`` run exits nonzero if anything
+got slower than ``--tolerance`` allows::
+
+    python bench/bench_startup.py --json startup.json
+    python bench/bench_startup.py --compare startup.json
+
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+from pathlib import Path
+import select
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+try:
+    import pty
+except ImportError:
+    pty = None
+
+ROOT = Path(__file__).parent.parent
+
+_deck = """\
+### slide::
+### title:: Only slide
+x = 1
+x + 1
+
+### slide::
+"""
+
+_main = "import sys; from sliderepl.main import main; main(sys.argv[1:])"
+
+
+def _env(root):
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        [str(root)] + [p for p in [env.get("PYTHONPATH")] if p]
+    )
+    # measure start up as installed, with bytecode already written
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    return env
+
+
+def _run_pty(args, cwd, env, stdin):
+    pid, fd = pty.fork()
+    if pid == 0:
+        os.chdir(cwd)
+        os.execve(sys.executable, [sys.executable] + args, env)
+    os.write(fd, stdin.encode())
+    while True:
+        ready, _, _ = select.select([fd], [], [], 10)
+        if not ready:
+            break
+        try:
+            if not os.read(fd, 65536):
+                break
+        except OSError:
+            break
+    os.waitpid(pid, 0)
+    os.close(fd)
+
+
+def _run(args, cwd, env, stdin=""):
+    start = time.perf_counter()
+    if pty is not None:
+        _run_pty(args, cwd, env, stdin)
+    else:
+        subprocess.run(
+            [sys.executable] + args,
+            cwd=cwd,
+            env=env,
+            input=stdin.encode(),
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+    return time.perf_counter() - start
+
+
+def _import_times(env):
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import sliderepl.main"],
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative) / 1e6
+    return times
+
+
+def _stats(times):
+    return {"best": min(times), "median": statistics.median(times)}
+
+
+def bench(root, repeat):
+    env = _env(root)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        env["SLIDEREPL_CACHE_DIR"] = os.path.join(tmp, "cache")
+        (Path(tmp) / "slides").mkdir()
+        (Path(tmp) / "deck.py").write_text(_deck)
+        (Path(tmp) / "slides" / "01_deck.py").write_text(_deck)
+
+        script = ["-c", _main, "deck.py", "--run-all"]
+        menu = ["-c", _main]
+
+        # write out bytecode and cache before timing anything
+        _import_times(env)
+        _run(script, tmp, env)
+
+        results["import"] = _stats(
+            [_import_times(env)["sliderepl.main"] for _ in range(repeat)]
+        )
+        results["script"] = _stats(
+            [_run(script, tmp, env) for _ in range(repeat)]
+        )
+        results["menu"] = _stats(
+            [_run(menu, tmp, env, stdin="q\n") for _ in range(repeat)]
+        )
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument(
+        "--root",
+        default=str(ROOT),
+        help="directory containing the sliderepl package to measure",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=10, help="runs of each benchmark"
+    )
+    parser.add_argument(
+        "--top",
+        type=int,
+        default=0,
+        metavar="N",
+        help="show N slowest imports",
+    )
+    parser.add_argument("--json", metavar="PATH", help="save results")
+    parser.add_argument(
+        "--compare", metavar="PATH", help="compare with saved results"
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=1.25,
+        help="with --compare, fail if best time exceeds the saved best "
+        "by this factor",
+    )
+    options = parser.parse_args(argv)
+
+    results = bench(options.root, options.repeat)
+
+    baseline = {}
+    if options.compare:
+        with open(options.compare) as fh:
+            baseline = json.load(fh)
+
+    regressed = []
+    print("%-8s %12s %12s %9s" % ("", "best", "median", "vs base"))
+    for name, numbers in results.items():
+        ratio = ""
+        if name in baseline:
+            factor = numbers["best"] / baseline[name]["best"]
+            ratio = "%.2fx" % factor
+            if factor > options.tolerance:
+                regressed.append(name)
+        print(
+            "%-8s %9.1f ms %9.1f ms %9s"
+            % (
+                name,
+                numbers["best"] * 1000,
+                numbers["median"] * 1000,
+                ratio,
+            )
+        )
+
+    if options.top:
+        times = _import_times(_env(options.root))
+        print("\nslowest imports (cumulative):")
+        for name, seconds in sorted(
+            times.items(), key=lambda item: item[1], reverse=True
+        )[: options.top]:
+            print("%9.1f ms  %s" % (seconds * 1000, name))
+
+    if options.json:
+        with open(options.json, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+    if regressed:
+        print("\nslower than the baseline: %s" % ", ".join(regressed))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
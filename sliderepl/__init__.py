@@ -1,10 +1,23 @@
 import sys
 
 
-if sys.stdout.isatty():
-    try:
-        from sliderepl.hairy import Deck
-    except ImportError:
+def __getattr__(name):
+    # Deck is imported on first use, so that importing one of our
+    # modules doesn't drag in the rest
+    if name != "Deck":
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    global Deck
+    if sys.stdout.isatty():
+        try:
+            # both are quick to import; hairy loads the slow parts of
+            # pygments the first time it highlights something
+            import pygments  # noqa
+            import termcolor  # noqa
+        except ImportError:
+            from sliderepl.core import Deck
+        else:
+            from sliderepl.hairy import Deck
+    else:
         from sliderepl.core import Deck
-else:
-    from sliderepl.core import Deck  # noqa
+    return Deck
@@ -0,0 +1,135 @@
+# sliderepl
+#   Copyright (c) Michael Bayer <mike_mp@zzzcomputing.com>
+#   sliderepl is released under the MIT License:
+#   http://www.opensource.org/licenses/mit-license.php
+"""Top-level ``await`` in slides and at the prompt.
+
+With ``--asyncio``, codeblocks and lines typed at the prompt are compiled
+allowing ``await`` outside of a function, as in ``python -m asyncio``.
+Code that awaits runs on one event loop that lasts for the whole
+session, so connection pools, tasks and the like made on one slide can
+be used on the next.  The loop runs only while such code is running;
+tasks left running in the background carry on the next time something
+awaits.  Code that doesn't await runs outside the loop, as it would
+without ``--asyncio``; the session's loop is its current event loop.
+
+Ctrl-C while code that awaits is running cancels it, so that its
+``finally`` blocks and context managers get to clean up, and the console
+carries on; a second Ctrl-C interrupts the cleanup as well.  Code that
+doesn't await is interrupted as usual.
+
+"""
+from __future__ import annotations
+
+import ast
+import asyncio
+import code
+import inspect
+import signal
+import threading
+import types
+from typing import Any
+from typing import Coroutine
+from typing import MutableMapping
+
+FLAGS = ast.PyCF_ALLOW_TOP_LEVEL_AWAIT
+
+
+def is_async(co: types.CodeType) -> bool:
+    """Return True if ``co`` awaits."""
+
+    return bool(co.co_flags & inspect.CO_COROUTINE)
+
+
+class Runner:
+    """Runs coroutines, one at a time, on a loop that outlives them."""
+
+    def __init__(self) -> None:
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def run_code(
+        self, co: types.CodeType, namespace: MutableMapping[str, Any]
+    ) -> None:
+        """Run a compiled codeblock in ``namespace``; on the loop if it
+        awaits.
+
+        Code that doesn't await runs outside the loop, so that it can call
+        ``asyncio.run()`` or ``run_until_complete()`` itself.
+
+        """
+        if is_async(co):
+            self.run(eval(co, namespace))
+            return
+        try:
+            exec(co, namespace)
+        finally:
+            # asyncio.run() leaves no current loop behind it
+            asyncio.set_event_loop(self.loop)
+
+    def run(self, coro: Coroutine) -> Any:
+        """Run ``coro`` to completion and return its result.
+
+        Ctrl-C cancels it, and KeyboardInterrupt is raised once it's
+        done.
+
+        """
+        task = self.loop.create_task(coro)
+        interrupted = False
+
+        def on_sigint(signum: int, frame: Any) -> None:
+            nonlocal interrupted
+            if interrupted or task.done():
+                raise KeyboardInterrupt()
+            interrupted = True
+            task.cancel()
+            # wake the loop up to notice
+            self.loop.call_soon_threadsafe(lambda: None)
+
+        previous = None
+        if threading.current_thread() is threading.main_thread():
+            previous = signal.signal(signal.SIGINT, on_sigint)
+        try:
+            return self.loop.run_until_complete(task)
+        except asyncio.CancelledError:
+            if interrupted:
+                raise KeyboardInterrupt() from None
+            raise
+        finally:
+            if previous is not None:
+                signal.signal(signal.SIGINT, previous)
+
+    def close(self) -> None:
+        """Cancel whatever tasks are left and close the loop."""
+
+        loop = self.loop
+        if loop.is_closed():
+            return
+        tasks = asyncio.all_tasks(loop)
+        for task in tasks:
+            task.cancel()
+        try:
+            loop.run_until_complete(
+                asyncio.gather(*tasks, return_exceptions=True)
+            )
+            loop.run_until_complete(loop.shutdown_asyncgens())
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
+
+
+class Console(code.InteractiveConsole):
+    """An InteractiveConsole that lets lines typed at it ``await``."""
+
+    def __init__(self, namespace: MutableMapping[str, Any], runner: Runner):
+        super().__init__(namespace)
+        self.compile.compiler.flags |= FLAGS
+        self.runner = runner
+
+    def runcode(self, co: types.CodeType) -> None:
+        try:
+            self.runner.run_code(co, self.locals)
+        except SystemExit:
+            raise
+        except BaseException:
+            self.showtraceback()
@@ -0,0 +1,229 @@
+# sliderepl
+#   Copyright (c) Michael Bayer <mike_mp@zzzcomputing.com>
+#   sliderepl is released under the MIT License:
+#   http://www.opensource.org/licenses/mit-license.php
+"""Run every chapter deck headless, in parallel, and report on it.
+
+Each deck runs in a worker process with a fresh namespace; slide output
+is captured rather than displayed.  The report records pass / fail and
+timing for each slide, as JSON or JUnit XML.
+
+"""
+from __future__ import annotations
+
+from argparse import Namespace
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stderr
+from contextlib import redirect_stdout
+import io
+import json
+import multiprocessing
+from pathlib import Path
+import sys
+import time
+import traceback
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Type
+from xml.etree import ElementTree
+
+from . import core
+
+_deck_cls: Optional[Type[core.Deck]] = None
+_options: Dict[str, Any] = {}
+
+
+def _init_worker(deck_cls: Type[core.Deck], options: Dict[str, Any]) -> None:
+    global _deck_cls, _options
+    _deck_cls = deck_cls
+    _options = options
+
+
+def _slide_name(slide: core.Deck.Slide) -> str:
+    if slide.title:
+        return slide.title
+    return next((line for line in slide.intro if line), "")
+
+
+def _run_slide(
+    deck: core.Deck,
+    slide: core.Deck.Slide,
+    number: int,
+    error: Optional[SyntaxError] = None,
+) -> Dict[str, Any]:
+    output = io.StringIO()
+    passed = True
+    start = time.perf_counter()
+    if error is not None:
+        output.write(slide._describe_error(error) + "\n")
+        passed = False
+    elif not slide.never_exec:
+        with redirect_stdout(output), redirect_stderr(output):
+            for idx, co in enumerate(slide.code):
+                passed = deck._exec(co, slide, idx) and passed
+    return {
+        "slide": number,
+        "name": _slide_name(slide),
+        "status": (
+            "failed"
+            if not passed
+            else "skipped"
+            if slide.never_exec
+            else "passed"
+        ),
+        "time": time.perf_counter() - start,
+        "output": output.getvalue(),
+    }
+
+
+def _run_deck(path: Path) -> Dict[str, Any]:
+    assert _deck_cls is not None
+    start = time.perf_counter()
+    output = io.StringIO()
+    try:
+        with redirect_stdout(output), redirect_stderr(output):
+            deck = _deck_cls.from_path(path, **dict(_options, validate=False))
+        # a slide with a syntax error fails, rather than being skipped
+        errors = dict(deck._validate())
+
+        core.environ = {"__name__": "__console__", "__doc__": None}
+        deck.setup_environ(core.environ)
+    except Exception:
+        # the deck fails as a whole, and the other decks carry on
+        return {
+            "deck": str(path),
+            "time": time.perf_counter() - start,
+            "failures": 1,
+            "error": output.getvalue() + traceback.format_exc(),
+            "slides": [],
+        }
+
+    slides = []
+    if deck.init_slide:
+        slides.append(
+            _run_slide(deck, deck.init_slide, 0, errors.get(deck.init_slide))
+        )
+    for number, slide in enumerate(deck.slides, 1):
+        slides.append(_run_slide(deck, slide, number, errors.get(slide)))
+    if deck.runner is not None:
+        deck.runner.close()
+
+    return {
+        "deck": str(path),
+        "time": time.perf_counter() - start,
+        "failures": sum(1 for s in slides if s["status"] == "failed"),
+        "slides": slides,
+    }
+
+
+def _junit(results: List[Dict[str, Any]]) -> str:
+    suites = ElementTree.Element("testsuites")
+    for result in results:
+        suite = ElementTree.SubElement(
+            suites,
+            "testsuite",
+            name=result["deck"],
+            tests=str(len(result["slides"])),
+            failures=str(result["failures"]),
+            skipped=str(
+                sum(1 for s in result["slides"] if s["status"] == "skipped")
+            ),
+            time="%.6f" % result["time"],
+        )
+        if "error" in result:
+            # an error, in JUnit's terms, rather than a failure
+            suite.set("tests", "1")
+            suite.set("failures", "0")
+            suite.set("errors", "1")
+            case = ElementTree.SubElement(
+                suite,
+                "testcase",
+                classname=Path(result["deck"]).stem,
+                name="deck",
+                time="%.6f" % result["time"],
+            )
+            error = ElementTree.SubElement(
+                case,
+                "error",
+                message=result["error"].strip().splitlines()[-1],
+            )
+            error.text = result["error"]
+        for slide in result["slides"]:
+            case = ElementTree.SubElement(
+                suite,
+                "testcase",
+                classname=Path(result["deck"]).stem,
+                name="slide %d %s" % (slide["slide"], slide["name"]),
+                time="%.6f" % slide["time"],
+            )
+            if slide["status"] == "failed":
+                failure = ElementTree.SubElement(case, "failure")
+                failure.text = slide["output"]
+            elif slide["status"] == "skipped":
+                ElementTree.SubElement(case, "skipped")
+            else:
+                ElementTree.SubElement(case, "system-out").text = slide[
+                    "output"
+                ]
+    return ElementTree.tostring(suites, encoding="unicode")
+
+
+def run_all(
+    deck_cls: Type[core.Deck], options: Namespace, paths: List[Path]
+) -> int:
+    """Run each deck in ``paths`` and write a report; returns the process
+    exit status, nonzero if any slide failed."""
+
+    deck_options = dict(vars(options))
+    deck_options["color"] = "never"
+
+    start_methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context(
+        "fork" if "fork" in start_methods else None
+    )
+    with ProcessPoolExecutor(
+        max_workers=options.jobs or None,
+        mp_context=context,
+        initializer=_init_worker,
+        initargs=(deck_cls, deck_options),
+    ) as pool:
+        results = list(pool.map(_run_deck, paths))
+
+    for result in results:
+        print(
+            "%s %s (%d slides, %.2fs)"
+            % (
+                "FAIL" if result["failures"] else "ok  ",
+                result["deck"],
+                len(result["slides"]),
+                result["time"],
+            )
+        )
+        if "error" in result:
+            print(
+                "     couldn't run the deck: %s"
+                % result["error"].strip().splitlines()[-1]
+            )
+        for slide in result["slides"]:
+            if slide["status"] == "failed":
+                lines = slide["output"].strip().splitlines()
+                print(
+                    "     slide %d: %s" % (slide["slide"], lines[-1])
+                    if lines
+                    else "     slide %d failed" % slide["slide"]
+                )
+
+    if options.report:
+        if options.report_format == "junit":
+            text = _junit(results)
+        else:
+            text = json.dumps({"decks": results}, indent=2)
+        with open(options.report, "w") as fh:
+            fh.write(text)
+
+    failures = sum(result["failures"] for result in results)
+    if failures:
+        sys.stderr.write("%d slide(s) failed\n" % failures)
+    return 1 if failures else 0
@@ -0,0 +1,436 @@
+# sliderepl
+#   Copyright (c) Michael Bayer <mike_mp@zzzcomputing.com>
+#   sliderepl is released under the MIT License:
+#   http://www.opensource.org/licenses/mit-license.php
+"""Other terminals following along with the presenter's.
+
+With ``--serve [HOST:]PORT``, the presenter forks a server that any
+number of followers attach to with ``--follow [HOST:]PORT``, on the same
+machine or across the network.  A follower mirrors everything the
+presenter's terminal shows; one attaching part way through a slide is
+sent what has been shown since the slide came up.  With
+``--follow-next``, a follower shows the slide after the presenter's
+current one instead, as a presenter's own second screen.
+
+The presenter hands what it writes to the server over a local datagram
+socket and never waits on it; if the server can't keep up, output is
+dropped rather than holding up the presenter.  The server queues
+messages separately for each follower, sending whatever has queued up
+in one go.  A follower too slow to keep up has its queue dropped and is
+brought up to date afresh.  The slide after the current one is sent as
+a line diff against the last one the follower was sent.
+
+Messages to followers are lines of JSON.
+
+POSIX only.
+
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import pickle
+import signal
+import socket
+import sys
+import threading
+import time
+from typing import Any
+from typing import Callable
+from typing import Deque
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from . import forking
+from . import terminal
+
+# messages queued for a follower before it's considered too slow
+QUEUE_LIMIT = 256
+
+# characters of a slide's output kept for followers attaching part way
+KEEP_OUTPUT = 65536
+
+# characters of output per datagram, well under the size limit of one
+_CHUNK = 16384
+
+
+def available() -> bool:
+    return hasattr(os, "fork") and hasattr(socket, "AF_UNIX")
+
+
+def parse_address(address: str) -> Tuple[str, int]:
+    """Return (host, port) for ``[HOST:]PORT``."""
+
+    host, _, port = address.rpartition(":")
+    return host or "localhost", int(port)
+
+
+def _listen(address: Tuple[str, int]) -> socket.socket:
+    """Return a socket listening on ``address``; socket.create_server()
+    without needing Python 3.8."""
+
+    host, port = address
+    family, type_, proto, _, sockaddr = socket.getaddrinfo(
+        host, port, type=socket.SOCK_STREAM, flags=socket.AI_PASSIVE
+    )[0]
+    sock = socket.socket(family, type_, proto)
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind(sockaddr)
+        sock.listen()
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def _diff(old: List[str], new: List[str]) -> list:
+    """Return ``[head, tail, lines]``, such that new is the first head
+    lines of old, then lines, then the last tail lines of old."""
+
+    limit = min(len(old), len(new))
+    head = 0
+    while head < limit and old[head] == new[head]:
+        head += 1
+    tail = 0
+    while tail < limit - head and old[-1 - tail] == new[-1 - tail]:
+        tail += 1
+    return [head, tail, new[head : len(new) - tail]]
+
+
+def _patch(old: List[str], diff: list) -> List[str]:
+    head, tail, lines = diff
+    return old[:head] + lines + old[len(old) - tail :]
+
+
+class _Tee:
+    """Passes writes on to a stream and to the server."""
+
+    def __init__(self, stream: Any, broadcast: Broadcast):
+        self._stream = stream
+        self._broadcast = broadcast
+
+    def write(self, text: str) -> int:
+        self._broadcast.output(text)
+        return self._stream.write(text)
+
+    def flush(self) -> None:
+        self._broadcast.flush()
+        self._stream.flush()
+
+    def __getattr__(self, key: str) -> Any:
+        return getattr(self._stream, key)
+
+
+class Broadcast:
+    """The presenter's end, which passes frames and output on to the
+    server.
+
+    Output arriving within ``delay`` seconds of the last that was passed
+    on is held back, up to a datagram's worth, and anything still held
+    is passed on ``delay`` seconds later, or when :meth:`flush` is
+    called.
+
+    """
+
+    def __init__(self, address: str, delay: float = 0.05):
+        self.address = parse_address(address)
+        self.delay = delay
+        self.pid: Optional[int] = None
+        self._sock: Optional[socket.socket] = None
+        self._streams: Optional[Tuple[Any, Any]] = None
+        self._pending: List[str] = []
+        self._size = 0
+        self._sent = 0.0
+        self._timer: Optional[threading.Timer] = None
+        self._lock = threading.Lock()
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def start(self) -> bool:
+        """Fork the server; returns False if it couldn't listen on the
+        address."""
+
+        try:
+            listener = _listen(self.address)
+        except OSError as err:
+            print(
+                "%% Can't serve followers on %s:%d: %s" % (*self.address, err)
+            )
+            return False
+        ours, theirs = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            try:
+                ours.close()
+                forking.close_report_fd()
+                signal.signal(signal.SIGINT, signal.SIG_IGN)
+                asyncio.run(_Server(listener, theirs).run())
+            finally:
+                os._exit(0)
+        listener.close()
+        theirs.close()
+        ours.setblocking(False)
+        self.pid, self._sock = pid, ours
+        print("%% Serving followers on %s:%d" % self.address)
+        return True
+
+    def _send(self, message: Any) -> None:
+        if self._sock is None:
+            return
+        try:
+            self._sock.send(pickle.dumps(message))
+        except BlockingIOError:
+            # the server is behind; followers miss this rather than the
+            # presenter waiting
+            pass
+        except OSError:
+            self._sock = None
+
+    def frame(self, num: int, total: int, upcoming: str) -> None:
+        """Note that slide ``num`` is up, and ``upcoming`` is the text of
+        the slide after it."""
+
+        self.flush()
+        self._send(("frame", num, total, upcoming[: _CHUNK * 4]))
+
+    def output(self, text: str) -> None:
+        with self._lock:
+            self._pending.append(text)
+            self._size += len(text)
+            if self._size < _CHUNK and (
+                self._timer is not None
+                or time.monotonic() - self._sent < self.delay
+            ):
+                # more is likely on its way; wait for it, up to delay
+                if self._timer is None:
+                    self._timer = threading.Timer(self.delay, self.flush)
+                    self._timer.daemon = True
+                    self._timer.start()
+                return
+            self._emit()
+
+    def _after_fork(self) -> None:
+        # a forked checkpoint inherits the timer but not its thread
+        self._timer = None
+
+    def flush(self) -> None:
+        with self._lock:
+            self._emit()
+
+    def _emit(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        text = "".join(self._pending)
+        self._pending = []
+        self._size = 0
+        self._sent = time.monotonic()
+        for start in range(0, len(text), _CHUNK):
+            self._send(("out", text[start : start + _CHUNK]))
+
+    def tee(self) -> None:
+        """Pass on whatever is written to stdout and stderr."""
+
+        self._streams = sys.stdout, sys.stderr
+        sys.stdout = _Tee(sys.stdout, self)
+        sys.stderr = _Tee(sys.stderr, self)
+
+    def close(self) -> None:
+        self.flush()
+        if self._streams is not None:
+            sys.stdout, sys.stderr = self._streams
+            self._streams = None
+        if self._sock is not None:
+            self._send(("end",))
+            self._sock.close()
+            self._sock = None
+        if self.pid is not None:
+            try:
+                os.waitpid(self.pid, 0)
+            except ChildProcessError:
+                pass
+            self.pid = None
+
+
+class _Follower:
+    def __init__(self) -> None:
+        from collections import deque
+
+        self.queue: Deque[tuple] = deque()
+        self.ready = asyncio.Event()
+        # the last slide after the current one this follower was sent
+        self.upcoming: List[str] = []
+
+    def push(self, item: tuple, sync: Callable[[], tuple]) -> None:
+        if len(self.queue) >= QUEUE_LIMIT:
+            self.queue.clear()
+            item = sync()
+        self.queue.append(item)
+        self.ready.set()
+
+
+class _Server:
+    def __init__(self, listener: socket.socket, feed: socket.socket):
+        self.listener = listener
+        self.feed = feed
+        self.parent = os.getppid()
+        self.followers: List[_Follower] = []
+        self.frame: Tuple[int, int, str] = (0, 0, "")
+        # what's been shown since the current slide came up
+        self.since: List[str] = []
+        self.since_size = 0
+        self.truncated = False
+
+    def _sync(self) -> tuple:
+        return ("sync", self.frame, "".join(self.since), self.truncated)
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        server = await asyncio.start_server(self._follow, sock=self.listener)
+        self.feed.setblocking(False)
+        while True:
+            try:
+                data = await asyncio.wait_for(
+                    loop.sock_recv(self.feed, 1 << 20), 1.0
+                )
+            except asyncio.TimeoutError:
+                if os.getppid() != self.parent:
+                    break
+                continue
+            message = pickle.loads(data)
+            if message[0] == "end":
+                break
+            self._dispatch(message)
+        for follower in self.followers:
+            follower.push(("end",), lambda: ("end",))
+        server.close()
+        # give followers a moment to be told
+        await asyncio.sleep(0.1)
+
+    def _dispatch(self, message: tuple) -> None:
+        if message[0] == "frame":
+            self.frame = message[1:]
+            self.since = []
+            self.since_size = 0
+            self.truncated = False
+        else:
+            text = message[1]
+            self.since.append(text)
+            self.since_size += len(text)
+            while self.since_size > KEEP_OUTPUT and len(self.since) > 1:
+                self.since_size -= len(self.since.pop(0))
+                self.truncated = True
+        for follower in self.followers:
+            follower.push(message, self._sync)
+
+    def _encode(self, follower: _Follower, items: List[tuple]) -> bytes:
+        lines = []
+        output: List[str] = []
+
+        def flush() -> None:
+            if output:
+                lines.append({"t": "out", "text": "".join(output)})
+                output.clear()
+
+        for item in items:
+            if item[0] == "out":
+                output.append(item[1])
+                continue
+            flush()
+            if item[0] == "end":
+                lines.append({"t": "end"})
+                continue
+            num, total, upcoming = item[1] if item[0] == "sync" else item[1:]
+            new = upcoming.splitlines(True)
+            message = {
+                "t": item[0],
+                "slide": num,
+                "total": total,
+                "next": _diff(follower.upcoming, new),
+            }
+            follower.upcoming = new
+            if item[0] == "sync":
+                message["output"] = item[2]
+                message["truncated"] = item[3]
+            lines.append(message)
+        flush()
+        return "".join(json.dumps(line) + "\n" for line in lines).encode()
+
+    async def _follow(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        follower = _Follower()
+        follower.push(self._sync(), self._sync)
+        self.followers.append(follower)
+        try:
+            while True:
+                await follower.ready.wait()
+                follower.ready.clear()
+                items = list(follower.queue)
+                follower.queue.clear()
+                writer.write(self._encode(follower, items))
+                await writer.drain()
+                if items[-1][0] == "end":
+                    break
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            self.followers.remove(follower)
+            writer.close()
+
+
+def follow(address: str, upcoming: bool = False) -> None:
+    """Follow along with a presenter serving on ``address``; with
+    ``upcoming``, show the slide after the presenter's current one."""
+
+    try:
+        asyncio.run(_follow(parse_address(address), upcoming))
+    except KeyboardInterrupt:
+        pass
+
+
+async def _follow(address: Tuple[str, int], upcoming: bool) -> None:
+    try:
+        reader, writer = await asyncio.open_connection(*address)
+    except OSError as err:
+        print("%% Can't follow %s:%d: %s" % (*address, err))
+        return
+    print("%% Following %s:%d" % address)
+    screen = terminal.Screen()
+    lines: List[str] = []
+    while True:
+        data = await reader.readline()
+        if not data:
+            break
+        message = json.loads(data)
+        if message["t"] == "out":
+            if not upcoming:
+                screen.write(message["text"])
+            continue
+        if message["t"] == "end":
+            break
+
+        lines = _patch(lines, message["next"])
+        if upcoming:
+            screen.clear()
+            if message["slide"] < message["total"]:
+                screen.write(
+                    "%% Next: slide %d of %d\n%s"
+                    % (message["slide"] + 1, message["total"], "".join(lines))
+                )
+            else:
+                screen.write(
+                    "%% Slide %d of %d is the last\n"
+                    % (message["slide"], message["total"])
+                )
+        elif message["t"] == "sync":
+            screen.clear()
+            if message["truncated"]:
+                screen.queue("...\n")
+            screen.write(message["output"])
+    writer.close()
+    print("\n%% The presenter has finished.")
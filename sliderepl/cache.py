@@ -0,0 +1,205 @@
+# sliderepl
+#   Copyright (c) Michael Bayer <mike_mp@zzzcomputing.com>
+#   sliderepl is released under the MIT License:
+#   http://www.opensource.org/licenses/mit-license.php
+"""On-disk cache of parsed and compiled decks.
+
+A cache entry holds everything :meth:`.Deck.from_path` would otherwise
+rebuild from source: slide flags, title, intro and bullet text, and the
+text of each file with the spans of it holding each slide's code, split
+into codeblocks if it has been validated.  Code is compiled when it's
+first run, so isn't cached.  Entries are keyed on the root deck path and
+are validated against the mtime and size of the root file and every
+``### file::`` include that went into them.
+
+The key also covers the deck class and the settings bullets are wrapped
+by when slides are parsed, along with the mtime and size of the
+``_config.py`` the class came from, if any.
+
+Entries also note which slides came from each file, so that a deck
+loaded from the cache with ``--watch`` only parses again the files that
+are edited.
+
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+from pathlib import Path
+import pickle
+import sys
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .core import Deck
+
+CACHE_VERSION = 9
+
+
+def cache_dir() -> Path:
+    """Return the directory where deck caches are stored."""
+
+    location = os.environ.get("SLIDEREPL_CACHE_DIR")
+    if location:
+        return Path(location)
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return Path(base) / "sliderepl"
+
+
+def clear() -> None:
+    """Remove all cached decks."""
+
+    import shutil
+
+    shutil.rmtree(cache_dir(), ignore_errors=True)
+    print("% deck cache cleared")
+
+
+def file_stamp(path: str) -> Tuple[str, int, int]:
+    """Return what's checked to tell whether a file has changed."""
+
+    st = os.stat(path)
+    return (path, st.st_mtime_ns, st.st_size)
+
+
+def _config_stamp(deck: Deck) -> Optional[Tuple[str, int, int]]:
+    if deck.config_file is None:
+        return None
+    try:
+        return file_stamp(deck.config_file)
+    except OSError:
+        return None
+
+
+def _entry_path(deck: Deck) -> Path:
+    deck_cls = type(deck)
+    key = "\0".join(
+        [
+            str(CACHE_VERSION),
+            sys.implementation.cache_tag or "",
+            f"{deck_cls.__module__}.{deck_cls.__qualname__}",
+            os.path.abspath(deck.path),
+            str(bool(deck.short_pres)),
+            # bullets are wrapped when the deck is parsed; the deck class
+            # and its settings may come from a _config.py
+            str(deck.bullet_width),
+            str(deck.min_banner_width),
+            repr(_config_stamp(deck)),
+        ]
+    )
+    return cache_dir() / (hashlib.sha1(key.encode()).hexdigest() + ".pickle")
+
+
+def _slots(cls: type) -> List[str]:
+    return [
+        name
+        for klass in cls.__mro__
+        for name in getattr(klass, "__slots__", ())
+        if name not in ("deck", "_code")
+    ]
+
+
+def _dump_slide(slide: Deck.Slide) -> dict:
+    # the text of a file is shared between its slides, and pickled once
+    state = {name: getattr(slide, name) for name in _slots(type(slide))}
+    state.update(getattr(slide, "__dict__", {}))
+    return state
+
+
+def _load_slide(deck: Deck, state: dict) -> Deck.Slide:
+    cls = type(deck).Slide
+    slide = cls.__new__(cls)
+    for name, value in state.items():
+        setattr(slide, name, value)
+    slide.deck = deck
+    slide._code = None
+    return slide
+
+
+def load(deck: Deck) -> bool:
+    """Populate ``deck`` from the cache.
+
+    Returns False if there is no entry for the deck or if any of the
+    files that went into it have changed since it was written.
+
+    """
+    try:
+        with open(_entry_path(deck), "rb") as fh:
+            entry = pickle.load(fh)
+        if entry["files"] != [file_stamp(p) for p, _, _ in entry["files"]]:
+            return False
+        init_slide: Optional[Deck.Slide] = (
+            _load_slide(deck, entry["init_slide"])
+            if entry["init_slide"] is not None
+            else None
+        )
+        slides: List[Deck.Slide] = [
+            _load_slide(deck, state) for state in entry["slides"]
+        ]
+    except Exception:
+        return False
+
+    deck.init_slide = init_slide
+    deck.slides = slides
+    deck.source_files = [path for path, _, _ in entry["files"]]
+    if deck._parsed_files is not None:
+        deck._parsed_files = {
+            path: (
+                stamps,
+                [init_slide if idx is None else slides[idx] for idx in found],
+            )
+            for path, (stamps, found) in entry["parsed"].items()
+        }
+    return True
+
+
+def store(deck: Deck) -> None:
+    """Write the parsed contents of ``deck`` to the cache."""
+
+    # the slides each file yielded, as their place in the deck, None
+    # being the setup slide
+    places: Dict[int, Optional[int]] = {
+        id(slide): idx for idx, slide in enumerate(deck.slides)
+    }
+    if deck.init_slide is not None:
+        places[id(deck.init_slide)] = None
+    entry: Any = {
+        "files": [file_stamp(path) for path in deck.source_files],
+        "init_slide": (
+            _dump_slide(deck.init_slide) if deck.init_slide else None
+        ),
+        "slides": [_dump_slide(slide) for slide in deck.slides],
+        "parsed": {
+            path: (
+                stamps,
+                [places[id(slide)] for slide in found if id(slide) in places],
+            )
+            for path, (stamps, found) in (deck._parsed_files or {}).items()
+        },
+    }
+    write(_entry_path(deck), entry)
+
+
+def write(path: Path, entry: Any) -> None:
+    """Pickle ``entry`` to ``path`` in the cache directory, replacing
+    whatever was there in one step."""
+
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(tmp, "wb") as fh:
+            pickle.dump(entry, fh, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+    except OSError:
+        # a cache we can't write to is not worth failing the deck over
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
@@ -0,0 +1,257 @@
+# sliderepl
+#   Copyright (c) Michael Bayer <mike_mp@zzzcomputing.com>
+#   sliderepl is released under the MIT License:
+#   http://www.opensource.org/licenses/mit-license.php
+"""Namespace checkpoints taken after each executed slide.
+
+Restoring a checkpoint puts the console namespace back the way it was
+right after a given slide ran, so that ``!goto`` to an earlier or already
+visited slide, or ``!rreallyrerun`` of a deck whose first slides haven't
+changed, doesn't have to replay the deck from the start.
+
+Two strategies are available.  ``fork`` keeps each checkpoint as a paused
+copy of the presenter process, and restoring one hands the session over
+to that copy; this captures everything, including connections and objects
+that can't be copied.  ``pickle`` keeps a pickled copy of the namespace;
+values that can't be pickled, such as modules or functions defined in the
+deck, are kept by reference.
+
+"""
+from __future__ import annotations
+
+import abc
+from collections import OrderedDict
+import os
+import pickle
+import sys
+import types
+from typing import Any
+from typing import Dict
+from typing import MutableMapping
+from typing import Optional
+from typing import Tuple
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .core import Deck
+
+
+def _notice(message: str) -> None:
+    print("% " + message)
+
+
+class RestoreCheckpoint(Exception):
+    """Raised in a resumed fork checkpoint to unwind back to the console."""
+
+    def __init__(self, slide: int, goto: int, reload: bool):
+        self.slide = slide
+        self.goto = goto
+        self.reload = reload
+
+
+class Checkpoints(abc.ABC):
+    """A bounded, least recently used collection of checkpoints, keyed on
+    the number of the slide after which each was taken.
+
+    Slide 0 is the state right after the initial setup slide.
+
+    """
+
+    def __init__(self, limit: int = 16, memory_limit: int = 0):
+        self.limit = limit
+        self.memory_limit = memory_limit
+        self._entries: OrderedDict[int, Tuple[bytes, Any]] = OrderedDict()
+
+    def best(self, deck: Deck, num: int) -> Optional[int]:
+        """Return the latest usable checkpoint taken at or before slide
+        ``num``."""
+
+        for key in sorted(self._entries, reverse=True):
+            if key <= num and self._entries[key][0] == deck._fingerprint(key):
+                return key
+        return None
+
+    def invalidate(self, deck: Deck) -> None:
+        """Discard checkpoints taken against slides that have since
+        changed."""
+
+        for key, (fingerprint, _) in list(self._entries.items()):
+            if key > len(deck.slides) or fingerprint != deck._fingerprint(key):
+                self._release(self._entries.pop(key)[1])
+
+    def save(
+        self, deck: Deck, num: int, environ: MutableMapping[str, Any]
+    ) -> None:
+        fingerprint = deck._fingerprint(num)
+        if num in self._entries:
+            self._release(self._entries.pop(num)[1])
+        state = self._snapshot(num, environ)
+        if state is None:
+            return
+        self._entries[num] = (fingerprint, state)
+        self._evict()
+
+    def restore(
+        self,
+        num: int,
+        environ: MutableMapping[str, Any],
+        goto: int,
+        reload: bool = False,
+    ) -> bool:
+        """Restore the namespace to the checkpoint taken after slide
+        ``num``.
+
+        Returns False if the checkpoint turns out to be unusable.
+
+        """
+        self._entries.move_to_end(num)
+        _notice("restoring checkpoint after slide %d" % num)
+        return self._restore(num, environ, goto, reload)
+
+    def close(self) -> None:
+        while self._entries:
+            self._release(self._entries.popitem()[1][1])
+
+    def _evict(self) -> None:
+        while len(self._entries) > 1 and (
+            len(self._entries) > self.limit
+            or (
+                self.memory_limit
+                and sum(
+                    self._size(state) for _, state in self._entries.values()
+                )
+                > self.memory_limit
+            )
+        ):
+            # the state after the setup slide is the last to go
+            key = next(k for k in self._entries if k != 0)
+            self._release(self._entries.pop(key)[1])
+
+    @abc.abstractmethod
+    def _snapshot(self, num: int, environ: MutableMapping[str, Any]) -> Any:
+        """Return the state to keep for the checkpoint after slide
+        ``num``, or None if one can't be taken."""
+
+    @abc.abstractmethod
+    def _restore(
+        self,
+        num: int,
+        environ: MutableMapping[str, Any],
+        goto: int,
+        reload: bool,
+    ) -> bool:
+        """Put the namespace back to the checkpoint after slide ``num``;
+        see :meth:`.restore`."""
+
+    def _release(self, state: Any) -> None:
+        pass
+
+    def _size(self, state: Any) -> int:
+        return 0
+
+
+class PickleCheckpoints(Checkpoints):
+    def _snapshot(
+        self, num: int, environ: MutableMapping[str, Any]
+    ) -> Tuple[bytes, Dict[str, Any]]:
+        # modules, and __builtins__ and the like, are never pickled;
+        # they're the same objects when the checkpoint is restored
+        by_reference = {
+            name: value
+            for name, value in environ.items()
+            if isinstance(value, types.ModuleType)
+            or (name.startswith("__") and name.endswith("__"))
+        }
+        rest = {
+            name: value
+            for name, value in environ.items()
+            if name not in by_reference
+        }
+        try:
+            return pickle.dumps(rest), by_reference
+        except Exception:
+            pass
+
+        picklable = {}
+        for name, value in rest.items():
+            try:
+                pickle.dumps(value)
+            except Exception:
+                by_reference[name] = value
+            else:
+                picklable[name] = value
+        # pickle what we can in one go, so that shared references
+        # between names survive
+        return pickle.dumps(picklable), by_reference
+
+    def _restore(
+        self,
+        num: int,
+        environ: MutableMapping[str, Any],
+        goto: int,
+        reload: bool,
+    ) -> bool:
+        data, by_reference = self._entries[num][1]
+        environ.clear()
+        environ.update(pickle.loads(data))
+        environ.update(by_reference)
+        return True
+
+    def _size(self, state: Tuple[bytes, Dict[str, Any]]) -> int:
+        return len(state[0])
+
+
+class ForkCheckpoints(Checkpoints):
+    def _snapshot(self, num: int, environ: MutableMapping[str, Any]) -> Any:
+        from . import forking
+
+        paused, message = forking.fork_paused()
+        if paused is None:
+            # we're the checkpoint, and we've just been resumed
+            raise RestoreCheckpoint(**message)
+        return paused
+
+    def _restore(
+        self,
+        num: int,
+        environ: MutableMapping[str, Any],
+        goto: int,
+        reload: bool,
+    ) -> bool:
+        paused = self._entries.pop(num)[1]
+
+        # checkpoints taken after this one belong to a timeline that's
+        # about to be abandoned
+        for key in [key for key in self._entries if key > num]:
+            self._release(self._entries.pop(key)[1])
+
+        try:
+            status = paused.resume(
+                {"slide": num, "goto": goto, "reload": reload}
+            )
+        except OSError:
+            _notice("checkpoint after slide %d is gone" % num)
+            return False
+        sys.stdout.flush()
+        os._exit(status)
+
+    def _release(self, state: Any) -> None:
+        state.discard()
+
+    def _size(self, state: Any) -> int:
+        return state.memory_size()
+
+
+def create(
+    mode: Optional[str], limit: int = 16, memory_limit: int = 0
+) -> Optional[Checkpoints]:
+    """Return a :class:`.Checkpoints` for the given strategy name, or None
+    if checkpoints are disabled."""
+
+    if not mode:
+        return None
+    if mode == "fork" and not hasattr(os, "fork"):
+        _notice("fork checkpoints aren't available here, using pickle")
+        mode = "pickle"
+    cls = ForkCheckpoints if mode == "fork" else PickleCheckpoints
+    return cls(limit=limit, memory_limit=memory_limit)
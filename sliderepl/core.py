@@ -5,18 +5,40 @@
 #   http://www.opensource.org/licenses/mit-license.php
 from __future__ import annotations
 
+import ast
 import code
+import contextlib
+import hashlib
 import inspect
+import io
+import itertools
 import os
 from pathlib import Path
 import re
 import sys
-import textwrap
+import threading
+import time
 import traceback
 from typing import Any
 from typing import Dict
 from typing import MutableMapping
 from typing import Optional
+from typing import TYPE_CHECKING
+
+from . import cache
+from . import checkpoint
+from . import deps
+from . import render
+from . import terminal
+from .checkpoint import RestoreCheckpoint
+
+if TYPE_CHECKING:
+    from .aio import Runner
+    from .broadcast import Broadcast
+    from .kernel import Kernel
+    from .memo import Memo
+    from .timer import Timer
+    from .watch import Watcher
 
 try:
     import rlcompleter
@@ -24,13 +46,59 @@ try:
 except ImportError:
     readline = None
 
-if sys.platform == "win32":
-    clearcmd = "cls"
-else:
-    clearcmd = "clear"
+environ = None
 
 
-environ = None
+_slide_re = re.compile(r"### +slide::(.+)?$")
+_file_re = re.compile(r"### +file::(.+)$")
+_title_re = re.compile(r"### +title::(.+)$")
+_title_re_2 = re.compile(r"^#####* (.+) #####*$")
+_bullet_re = re.compile(r"^###( +\* .+)$")
+_comment_re = re.compile(r"#(?: (.*))?$")
+
+# the characters of the box drawn around a slide's banner
+(
+    _box_ul,
+    _box_ur,
+    _box_ll,
+    _box_lr,
+    _box_ls,
+    _box_rs,
+    _box_line,
+    _box_dash,
+) = (
+    render.parse_markup(char)
+    for char in "\u250C\u2510\u2514\u2518\u251C\u2524\u2502\u2500"
+)
+
+
+def _split_lines(text):
+    """Split text into lines, keeping line endings; only newlines end a
+    line, as when reading a file."""
+
+    lines = text.split("\n")
+    last = lines.pop()
+    lines = [line + "\n" for line in lines]
+    if last:
+        lines.append(last)
+    return lines
+
+
+def _offset_lines(text):
+    """Yield (offset, line) for each line of text."""
+
+    start = 0
+    for line in _split_lines(text):
+        yield start, line
+        start += len(line)
+
+
+@contextlib.contextmanager
+def _redirect_output(stream):
+    with contextlib.redirect_stdout(stream), contextlib.redirect_stderr(
+        stream
+    ):
+        yield
 
 
 class ReallyRerun(Exception):
@@ -38,6 +106,12 @@ class ReallyRerun(Exception):
         self.slide = slide
 
 
+class SwitchDeck(Exception):
+    def __init__(self, path, slide):
+        self.path = path
+        self.slide = slide
+
+
 class Deck:
     expose = (
         "next",
@@ -48,6 +122,12 @@ class Deck:
         "rerun",
         "presentation",
         "rreallyrerun",
+        "search",
+        "skipped",
+        "forget",
+        "plan",
+        "profile",
+        "mem",
         "quit",
     )
 
@@ -66,17 +146,74 @@ class Deck:
         self.init_slide: Optional[Deck.Slide] = None
         self.color = options.get("color", None)
         self.short_pres = options.get("short", False)
+        self.use_cache = not options.get("no_cache", False)
+        self.config_file = options.get("config_file")
+        self.source_files = []
+        # the stamps of the files each file parsed went on to include,
+        # and the slides they yielded, keyed on path; --watch parses
+        # again only the files that changed, and the cache keeps these
+        # for it
+        self._parsed_files: Optional[Dict[str, tuple]] = (
+            {} if options.get("watch") or self.use_cache else None
+        )
+        self._reusable: Dict[str, tuple] = {}
+        self.watcher: Optional[Watcher] = None
+        self.broadcast: Optional[Broadcast] = None
+        self.timer: Optional[Timer] = None
+        self.runner: Optional[Runner] = None
+        # the flag is new in Python 3.8
+        self._compile_flags = (
+            getattr(ast, "PyCF_ALLOW_TOP_LEVEL_AWAIT", 0)
+            if options.get("asyncio")
+            else 0
+        )
+        self.checkpoints: Optional[checkpoint.Checkpoints] = None
+        self.kernel: Optional[Kernel] = None
+        self.memo: Optional[Memo] = None
+        if self.use_cache and not options.get("kernel"):
+            from . import memo
+
+            self.memo = memo.Memo(self)
+        self._fingerprints = []
+        self.minimal_replay = options.get("minimal_replay", False)
+        self._block_names: Dict[Deck.Slide, list] = {}
+        # (slide number, codeblock index) of codeblocks a minimal replay
+        # passed over, in the order they would have run
+        self._behind = []
+        self._frames: Dict[Deck.Slide, render.Frame] = {}
+        self._frames_lock = threading.Lock()
+        self._screen = terminal.Screen(options.get("alt_screen", False))
+        self._prefetch = (
+            render.Prefetcher(self, options["prefetch"])
+            if options.get("prefetch")
+            else None
+        )
+        self._profiler = None
+        if options.get("profile"):
+            from . import profiling
+
+            self._profiler = profiling.Profiler(
+                self, options["profile"], options.get("profile_dir") or "."
+            )
+        self._memory = None
+        if options.get("mem"):
+            from . import memory
+
+            self._memory = memory.Memory(self, options["mem"])
         self._set_presentation(options.get("presentation", False))
         self.pending_exec = False
+        self.skipped_output = options.get("skipped_output") or "capture"
+        self._skipped_output = io.StringIO()
         self._letter_commands = {}
         self._expose_map: Dict[str, Any] = dict(
             (f"!{name}", getattr(self, name)) for name in self.expose
         )
 
         for name in self.expose:
-            short_cmd = f"!{name[0]}"
-            if short_cmd in self._expose_map:
-                short_cmd = f"!{name[0:2]}"
+            size = 1
+            while f"!{name[0:size]}" in self._expose_map:
+                size += 1
+            short_cmd = f"!{name[0:size]}"
             self._expose_map[short_cmd] = getattr(self, name)
             self._letter_commands[f"!{name}"] = short_cmd
         self._expose_map["?"] = self.commands
@@ -154,64 +291,231 @@ class Deck:
         self._do_slide(self.current, run=run)
 
     def _do_bullet(self, bullet, *, prompt=True):
-        indent = re.match(r"^ +\* ", bullet)
-        assert indent is not None
-        padding = len(indent.group(0)) * " "
-
-        bullet = "\n".join(
-            [
-                padding + line if lineno > 0 else line
-                for lineno, line in enumerate(
-                    textwrap.wrap(bullet, width=self.bullet_width)
-                )
-            ]
-        )
-
-        bullet_tokens = re.match(r"^( +)\* (.*)", bullet, re.S)
-
-        assert bullet_tokens
-
-        bullet = self._color(f"{bullet_tokens.group(1)}\u2022 ", "boldbullet")
-
-        color = "plain"
-        for element in re.split(r"(\*\*|``)", bullet_tokens.group(2)):
-            if element == "**":
-                color = "boldbullet" if color != "boldbullet" else "plain"
-            elif element == "``":
-                color = "codebullet" if color != "codebullet" else "plain"
-            else:
-                bullet += self._color(element, color)
+        """Show a bullet, as rendered by _render_bullets(), and with
+        prompt, wait for the return key."""
 
         if prompt:
-            input(f"{bullet}\n\n")
+            sys.stdout.flush()
+            self._input(self._screen.take() + bullet)
         else:
-            print(f"{bullet}\n\n")
+            self._screen.queue(bullet + "\n")
+
+    def _render_bullets(self, slide):
+        """Return the text of each bullet, and whether it waits for the
+        return key."""
+
+        last = len(slide.bullet_markup) - 1
+        has_code = slide.has_code
+        return [
+            (
+                self._render_markup(bullet, "plain") + "\n\n",
+                has_code or idx != last,
+            )
+            for idx, bullet in enumerate(slide.bullet_markup)
+        ]
+
+    def _render_head(self, slide):
+        if self._presentation and not slide.no_clear:
+            return f"{self.banner_top}\n{slide._banner()}\n"
+        else:
+            return f"{slide._banner()}\n"
+
+    def _render_state(self):
+        """Settings that rendered frames depend upon."""
+        return (self._presentation, self.ps1, self.ps2)
+
+    def _render_upcoming(self, num):
+        """The text of the slide after slide num, as shown to a follower
+        previewing it."""
+
+        if num >= len(self.slides):
+            return ""
+        slide = self.slides[num]
+        frame = self._frame(slide)
+        return (
+            frame.head
+            + "".join(bullet for bullet, _ in frame.bullets)
+            + "".join(frame.blocks(not slide.no_exec))
+        )
+
+    def _frame(self, slide):
+        # rendered on the prefetch thread as well as this one
+        with self._frames_lock:
+            frame = self._frames.get(slide)
+        if frame is None or frame.state != self._render_state():
+            frame = render.Frame(self, slide)
+            with self._frames_lock:
+                self._frames[slide] = frame
+        return frame
 
     def _do_slide(self, num, run=True, echo=True):
         slide = self.slides[num - 1]
         if echo:
-            if self._presentation:
-                if not slide.no_clear:
-                    os.system(clearcmd)
-                    print(self.banner_top)
-                    print(slide._banner())
-                    self.current_top_slide = num
-                else:
-                    print(slide._banner())
-            else:
-                print(slide._banner())
-
-            if slide.bullets and run != "force":
-                last_bullet = slide.bullets[-1]
-                has_code = bool(slide.codeblocks)
-                for bullet in slide.bullets:
-                    self._do_bullet(
-                        bullet, prompt=has_code or bullet is not last_bullet
-                    )
+            # the screen is cleared, and the head, bullets and first
+            # codeblock drawn, in one write
+            started = time.perf_counter()
+            frame = self._frame(slide)
+            rendered = time.perf_counter() - started
+            screen = self._screen
+            if self.broadcast is not None:
+                self.broadcast.frame(
+                    num, len(self.slides), self._render_upcoming(num)
+                )
+            if self._presentation and not slide.no_clear:
+                screen.enter()
+                screen.clear()
+                self.current_top_slide = num
+            if slide.error is not None:
+                # found while rendering; shown after the clear so that
+                # it isn't cleared away
+                screen.queue("%% %s\n" % slide.error)
+            screen.queue(frame.head)
+            if self.timer is not None:
+                self.timer.shown(self, num, rendered)
+                screen.queue(
+                    "%s\n\n" % self._color(self.timer.status(), "slidenum")
+                )
+
+            if run != "force":
+                if self._prefetch is not None:
+                    self._prefetch.after(num)
+
+                for bullet, prompt in frame.bullets:
+                    self._do_bullet(bullet, prompt=prompt)
 
-        slide.run(run=run, echo=echo)
+        executed = slide.run(run=run, echo=echo)
+        self._screen.write("")
         if run != "force" and slide.no_exec and not slide.never_exec:
             self.pending_exec = True
+        if executed:
+            self._checkpoint(num)
+
+    def _exec(self, co, slide=None, index=0):
+        """Run a compiled codeblock in the console namespace.
+
+        Exceptions are printed rather than raised; returns False if the
+        codeblock raised.
+
+        """
+        measured = slide is not None and (
+            self._profiler is not None
+            or self.timer is not None
+            or self._memory is not None
+        )
+        if self.kernel is not None:
+            if not measured:
+                return self.kernel.run(co)
+            with self._measure(slide, index):
+                return self.kernel.run(co)
+        try:
+            if not measured:
+                self._run_code(co)
+            else:
+                with self._measure(slide, index):
+                    self._run_code(co)
+        except:
+            traceback.print_exc()
+            return False
+        else:
+            return True
+
+    @contextlib.contextmanager
+    def _measure(self, slide, index):
+        """Profile, time and measure the memory of a codeblock of slide,
+        for --profile, --timer and --mem."""
+
+        with contextlib.ExitStack() as stack:
+            if self._profiler is not None:
+                stack.enter_context(self._profiler.measure(slide, index))
+            if self._memory is not None:
+                stack.enter_context(self._memory.measure(slide, index))
+            if self.timer is not None and slide is not self.init_slide:
+                stack.enter_context(self.timer.measure(slide.index, index))
+            yield
+
+    def _run_code(self, co):
+        """Run a compiled codeblock in the console namespace, on the
+        event loop with --asyncio."""
+
+        if not self._compile_flags:
+            exec(co, environ)
+            return
+        if self.runner is None:
+            from . import aio
+
+            self.runner = aio.Runner()
+        self.runner.run_code(co, environ)
+
+    def _run_codeblocks(self, slide, show=None):
+        """Run the codeblocks of a slide, calling show with the index of
+        each one before it runs.
+
+        Slides with the m flag are replayed from the memo if they can be.
+        Returns False if a codeblock raised.
+
+        """
+        if show is None or self._behind:
+            # draw what there is of the frame before anything is printed
+            self._screen.write("")
+        if self._behind:
+            self._catch_up(self._needs(slide))
+        slide._split()
+        if slide.error is not None:
+            # a slide that's shown has the error shown along with it,
+            # and isn't run
+            print("%% %s" % slide.error)
+            return False
+        if slide.memo and self.memo is not None:
+            return self.memo.run(slide, environ, show)
+        ok = True
+        for idx, co in enumerate(slide.code):
+            if show is not None:
+                show(idx)
+            ok = self._exec(co, slide, idx) and ok
+        return ok
+
+    def _checkpoint(self, num):
+        # after a minimal replay the namespace isn't what it would be
+        # after slide num, until it has caught up
+        if self.checkpoints is not None and not self._behind:
+            self.checkpoints.save(self, num, environ)
+
+    def _fingerprint(self, num):
+        """Return a hash of the code in the setup slide and slides 1 through
+        num, identifying the state a checkpoint after slide num was taken
+        from."""
+
+        while len(self._fingerprints) <= num:
+            idx = len(self._fingerprints)
+            hash_ = hashlib.sha1(
+                self._fingerprints[-1] if self._fingerprints else b""
+            )
+            slide = self.init_slide if idx == 0 else self.slides[idx - 1]
+            if slide is not None:
+                hash_.update(slide.source.encode("utf-8"))
+            self._fingerprints.append(hash_.digest())
+        return self._fingerprints[num]
+
+    def _restore_checkpoint(self, slide_number, reload=False):
+        """Restore the namespace to the latest checkpoint before
+        slide_number, if that's less work than running forward from the
+        current slide."""
+
+        if self.checkpoints is None:
+            return False
+        num = self.checkpoints.best(self, slide_number - 1)
+        if num is None or (
+            not reload and slide_number > self.current and num <= self.current
+        ):
+            return False
+        if self.timer is not None:
+            # a forked checkpoint resumes with the timer as it was
+            self.timer.flush()
+        if not self.checkpoints.restore(num, environ, slide_number, reload):
+            return False
+        self.current = num
+        self._behind = []
+        return True
 
     def slide_actor(fn):
         def decorated(self, slide_number):
@@ -241,15 +545,260 @@ class Deck:
         """goto slide <number>"""
 
         self.pending_exec = False
+        self._restore_checkpoint(slide_number)
         if slide_number <= self.current:
             self.current = slide_number
             self._do_slide(self.current)
         else:
-            rg = range(slide_number - self.current)
-            for _ in rg[0:-1]:
-                self._next(run="force")
+            self._fast_forward(slide_number - 1, self.minimal_replay)
             self._next()
 
+    def _rerun_from(self, slide_number):
+        """Run slide_number through the current slide again, and show the
+        current slide.
+
+        Starts from the latest checkpoint before slide_number.  Without
+        one, the slides would run again on top of what they left behind
+        the first time, so the whole deck is reloaded instead, as by
+        !rreallyrerun.
+
+        """
+        target = self.current
+        self.pending_exec = False
+        num = (
+            self.checkpoints.best(self, slide_number - 1)
+            if self.checkpoints is not None
+            else None
+        )
+        if num is None or not self.checkpoints.restore(
+            num, environ, target, True
+        ):
+            raise ReallyRerun(target)
+        self.current = num
+        self._behind = []
+        self._fast_forward(target - 1, self.minimal_replay)
+        self._next()
+
+    @slide_actor
+    def plan(self, slide_number):
+        """plan <number>, list code !goto runs with --minimal-replay"""
+
+        if slide_number <= self.current:
+            keys = self._plan(self._needs(self.slides[slide_number - 1]))
+        else:
+            keys = self._plan(
+                self._needs(self.slides[slide_number - 1]), slide_number - 1
+            )
+        total = len(self._behind) + sum(
+            len(slide.displays)
+            for slide in self.slides[self.current : slide_number - 1]
+            if not slide.never_exec
+        )
+        if not keys:
+            print("%% Slide %d needs no earlier code to run." % slide_number)
+            return
+
+        by_slide = {}
+        for num, idx in keys:
+            by_slide.setdefault(num, []).append(idx)
+        print(
+            "%% Slide %d needs %d of %d codeblocks to run first:"
+            % (slide_number, len(keys), total)
+        )
+        for num, blocks in by_slide.items():
+            slide = self.slides[num - 1]
+            print(
+                "%%   slide %d: %s%s"
+                % (
+                    num,
+                    (
+                        "all codeblocks"
+                        if len(blocks) == len(slide.displays)
+                        else (
+                            "codeblock " if len(blocks) == 1 else "codeblocks "
+                        )
+                        + ", ".join(str(idx + 1) for idx in blocks)
+                    ),
+                    " (a)" if slide.always_exec else "",
+                )
+            )
+
+    def _names(self, slide):
+        if slide not in self._block_names:
+            self._block_names[slide] = [
+                deps.analyze("".join(display)) for display in slide.displays
+            ]
+        return self._block_names[slide]
+
+    def _needs(self, slide):
+        """Return the names the codeblocks of a slide read, or None if
+        they can't be told."""
+
+        needed = set()
+        for names in self._names(slide):
+            if names.opaque:
+                return None
+            needed |= names.reads
+        return needed
+
+    def _plan(self, needed, slide_number=None):
+        """Return the codeblocks to run for the names in needed to be as
+        they'd be had everything up to slide_number run, taking in the
+        codeblocks a minimal replay has passed over so far.
+
+        needed of None means everything.
+
+        """
+        keys = list(self._behind)
+        if slide_number is not None:
+            keys += [
+                (num, idx)
+                for num in range(self.current + 1, slide_number + 1)
+                if not self.slides[num - 1].never_exec
+                for idx in range(len(self.slides[num - 1].displays))
+            ]
+        if needed is None:
+            return keys
+        blocks = []
+        for num, idx in keys:
+            slide = self.slides[num - 1]
+            blocks.append(
+                ((num, idx), self._names(slide)[idx], slide.always_exec)
+            )
+        return deps.plan(blocks, needed)
+
+    def _replay(self, keys):
+        """Run the given codeblocks; returns the numbers of the slides that
+        raised."""
+
+        failed = []
+        done = set()
+        for num, idx in keys:
+            if (num, idx) in done:
+                continue
+            slide = self.slides[num - 1]
+            if slide.memo and self.memo is not None:
+                # the memo has a slide's codeblocks all or nothing
+                blocks = set(range(len(slide.code)))
+                ok = self._run_codeblocks(slide)
+            else:
+                blocks = {idx}
+                ok = self._exec(slide.code[idx], slide, idx)
+            done.update((num, block) for block in blocks)
+            self._behind = [key for key in self._behind if key not in done]
+            if not ok and num not in failed:
+                failed.append(num)
+        return failed
+
+    def _catch_up(self, needed):
+        """Run the codeblocks passed over by a minimal replay that the
+        names in needed depend on."""
+
+        keys = self._plan(needed)
+        if not keys:
+            return
+        print("%% Running %d codeblocks skipped by !goto first" % len(keys))
+        if self.skipped_output == "show":
+            failed = self._replay(keys)
+        else:
+            with _redirect_output(self._skipped_output):
+                failed = self._replay(keys)
+        self._report_failed(failed)
+
+    def _fast_forward(self, slide_number, minimal=False):
+        """Run the slides up to and including slide_number without
+        displaying them.
+
+        Their output goes to the buffer shown by !skipped, unless the
+        skipped_output option says otherwise.  With minimal, only the
+        codeblocks that the slide after slide_number depends on are run.
+        Returns the numbers of the slides that raised.
+
+        """
+        if self.current >= slide_number:
+            return []
+
+        if minimal:
+            return self._fast_forward_minimal(slide_number)
+
+        self._skipped_output = io.StringIO()
+        if self.skipped_output == "show":
+            capture = contextlib.nullcontext()
+        else:
+            capture = _redirect_output(self._skipped_output)
+
+        failed = []
+        with capture:
+            while self.current < slide_number:
+                self.current += 1
+                slide = self.slides[self.current - 1]
+                if self._presentation and not slide.no_clear:
+                    self.current_top_slide = self.current
+                if slide.never_exec or not slide.has_code:
+                    continue
+                if not self._run_codeblocks(slide):
+                    failed.append(self.current)
+                self._checkpoint(self.current)
+
+        if self.skipped_output == "discard":
+            self._skipped_output = io.StringIO()
+        self._report_failed(failed)
+        return failed
+
+    def _fast_forward_minimal(self, slide_number):
+        needed = (
+            self._needs(self.slides[slide_number])
+            if slide_number < len(self.slides)
+            else None
+        )
+        keys = self._plan(needed, slide_number)
+        run = set(keys)
+        self._behind = [
+            key for key in self._plan(None, slide_number) if key not in run
+        ]
+        while self.current < slide_number:
+            self.current += 1
+            slide = self.slides[self.current - 1]
+            if self._presentation and not slide.no_clear:
+                self.current_top_slide = self.current
+
+        self._skipped_output = io.StringIO()
+        if self.skipped_output == "show":
+            failed = self._replay(keys)
+        else:
+            with _redirect_output(self._skipped_output):
+                failed = self._replay(keys)
+        if self.skipped_output == "discard":
+            self._skipped_output = io.StringIO()
+        self._report_failed(failed)
+        return failed
+
+    def _report_failed(self, failed):
+        # !skipped only has something to show if output was captured
+        if self.skipped_output == "capture":
+            message = "%% Slide %d raised an exception, see !skipped"
+        else:
+            message = "%% Slide %d raised an exception."
+        for num in failed:
+            print(message % num)
+
+    def skipped(self):
+        """Show output of the slides run without display by !goto"""
+
+        output = self._skipped_output.getvalue()
+        if output:
+            sys.stdout.write(output)
+        else:
+            print("% No output from skipped slides.")
+
+    def forget(self):
+        """Forget the memoized output of this deck's m slides"""
+
+        if self.memo is None:
+            print("% Memoized slides aren't used with --kernel or --no-cache")
+        else:
+            print("%% Forgot %d memoized slides." % self.memo.forget())
+
     def info(self):
         """Display information about this slide deck."""
         print(
@@ -257,6 +806,59 @@ class Deck:
             % (self.current, len(self.slides), self.path)
         )
 
+    def search(self, term):
+        """search <term>, find slides about term in the decks here"""
+
+        from . import index
+        from . import menu
+
+        paths = menu.chapters(Path(self.path).parent)
+        if Path(self.path) not in paths:
+            paths.append(Path(self.path))
+        idx = index.Index(
+            type(self), short=self.short_pres, no_cache=not self.use_cache
+        )
+        idx.refresh(paths)
+        matches = idx.search(term)
+        if not matches:
+            print("%% No slides found for %r" % term)
+            return
+
+        here = os.path.abspath(self.path)
+        for match in matches:
+            print(
+                "%% %s slide %d: %s (%s)"
+                % (
+                    (
+                        "this deck,"
+                        if os.path.abspath(match.path) == here
+                        else match.path
+                    ),
+                    match.slide,
+                    match.title,
+                    match.field,
+                )
+            )
+        best = matches[0]
+        if os.path.abspath(best.path) == here:
+            self.goto(best.slide)
+        else:
+            raise SwitchDeck(best.path, best.slide)
+
+    def profile(self):
+        """Show the slowest slides and codeblocks run so far."""
+        if self._profiler is None:
+            print("% Profiling is off; start sliderepl with --profile")
+        else:
+            self._profiler.report()
+
+    def mem(self):
+        """Show memory growth by slide, the largest objects and lines."""
+        if self._memory is None:
+            print("% Memory isn't measured; start sliderepl with --mem")
+        else:
+            self._memory.report(environ)
+
     def commands(self):
         """Display this help message."""
         for cmd in ["?"] + ["!%s" % exp for exp in self.expose]:
@@ -276,24 +878,127 @@ class Deck:
     del slide_actor
 
     class Slide(object):
-        no_clear = False
-        no_exec = False
-        never_exec = False
-        no_echo = False
-        init = False
-        has_bullets = False
-        title = None
-
-        def __init__(self, deck, file, index):
+        """A slide's flags, text and code.
+
+        The code is kept as spans of the text of the file it came from,
+        which all the slides of a file share.  It's split into one
+        codeblock per statement the first time it's displayed, and
+        compiled the first time it's run.
+
+        """
+
+        __slots__ = (
+            "deck",
+            "file",
+            "index",
+            "no_clear",
+            "no_exec",
+            "never_exec",
+            "always_exec",
+            "memo",
+            "no_echo",
+            "init",
+            "has_bullets",
+            "title",
+            "title_markup",
+            "intro",
+            "intro_markup",
+            "bullets",
+            "bullet_markup",
+            "_buffer",
+            "_offset",
+            "_first_line",
+            "_spans",
+            "error",
+            "_blocks",
+            "_code",
+        )
+
+        def __init__(self, deck, file, index, buffer=""):
             self.deck = deck
-            self.codeblocks = []
-            self.lines = []
-            self.intro = []
-            self.bullets = []
-            self._stack = []
-            self._level = None
             self.file = file
             self.index = index
+            self.no_clear = False
+            self.no_exec = False
+            self.never_exec = False
+            self.always_exec = False
+            self.memo = False
+            self.no_echo = False
+            self.init = False
+            self.has_bullets = False
+            self.title = None
+            self.title_markup = None
+            self.intro = []
+            self.intro_markup = ()
+            self.bullets = []
+            self.bullet_markup = ()
+            self._buffer = buffer
+            # offset in _buffer of the slide's first line, and the number
+            # of lines in the file before it
+            self._offset = 0
+            self._first_line = 0
+            # (start, end) offsets of the code in _buffer
+            self._spans = []
+            # (first, last + 1) source line of each codeblock, once split
+            self._blocks = None
+            self._code = None
+            # why the code won't run, once it's been split and didn't parse
+            self.error = None
+
+        @property
+        def source(self):
+            return "".join(
+                self._buffer[start:end] for start, end in self._spans
+            )
+
+        @property
+        def has_code(self):
+            return bool(self._spans)
+
+        @property
+        def displays(self):
+            """The display lines of each codeblock."""
+
+            lines = _split_lines(self.source)
+            if not lines:
+                return []
+            return [
+                lines[first:last]
+                for first, last in self._split() or ((0, len(lines)),)
+            ]
+
+        @property
+        def code(self):
+            """The code object of each codeblock."""
+
+            if self._code is None:
+                displays = self.displays
+                mode = getattr(self, "no_return", False) and "exec" or "single"
+                flags = self.deck._compile_flags
+                memory = self.deck._memory
+                if self._blocks and memory is not None and memory.traced:
+                    # allocations are traced back to the deck file
+                    self._code = [
+                        memory.compile(self, first, display, mode, flags)
+                        for (first, _), display in zip(self._blocks, displays)
+                    ]
+                elif self._blocks:
+                    self._code = [
+                        compile("".join(display), "<input>", mode, flags)
+                        for display in displays
+                    ]
+                else:
+                    # comments only
+                    self._code = [
+                        compile("pass", "<input>", mode, flags)
+                    ] * len(displays)
+            return self._code
+
+        @property
+        def codeblocks(self):
+            """(display lines, code object) for each codeblock."""
+
+            return list(zip(self.displays, self.code))
 
         def _banner(self):
             banner = ""
@@ -306,17 +1011,17 @@ class Deck:
             title = None
 
             if self.title:
-                title = "*** " + self.title + " ***"
-                title_len = len(title)
+                title_len = self.title_markup.width
                 box_size = max(box_size, title_len)
-                title = self.deck._color(title, "titletext")
+                title = self.deck._render_markup(
+                    self.title_markup, "titletext"
+                )
             else:
                 title_len = 0
 
             if self.intro:
                 box_size = max(
-                    *[box_size]
-                    + [len(self.deck._decolorize(l)) for l in self.intro]
+                    *[box_size] + [l.width for l in self.intro_markup]
                 )
 
             box_size += 4
@@ -324,15 +1029,15 @@ class Deck:
             if not self.deck._presentation:
                 banner += "\n"
 
-            # box_plus = self.deck._color("+", "box")
-            box_ul = self.deck._color("\u250C", "box")
-            box_ur = self.deck._color("\u2510", "box")
-            box_ll = self.deck._color("\u2514", "box")
-            box_lr = self.deck._color("\u2518", "box")
-            box_ls = self.deck._color("\u251C", "box")
-            box_rs = self.deck._color("\u2524", "box")
-            box_line = self.deck._color("\u2502", "box")  # |
-            box_dash = self.deck._color("\u2500", "box")  # -
+            render_markup = self.deck._render_markup
+            box_ul = render_markup(_box_ul, "box")
+            box_ur = render_markup(_box_ur, "box")
+            box_ll = render_markup(_box_ll, "box")
+            box_lr = render_markup(_box_lr, "box")
+            box_ls = render_markup(_box_ls, "box")
+            box_rs = render_markup(_box_rs, "box")
+            box_line = render_markup(_box_line, "box")  # |
+            box_dash = render_markup(_box_dash, "box")  # -
 
             banner += f"{box_ul}%s{box_ur}\n" % (box_dash * (box_size - 1))
 
@@ -352,17 +1057,10 @@ class Deck:
                         "\n".join(
                             f"{box_line} %s%s{box_line}"
                             % (
-                                self.deck._color(l, "intro_line"),
-                                (
-                                    " "
-                                    * (
-                                        box_size
-                                        - len(self.deck._decolorize(l))
-                                        - 2
-                                    )
-                                ),
+                                self.deck._render_markup(l, "intro_line"),
+                                (" " * (box_size - l.width - 2)),
                             )
-                            for l in self.intro
+                            for l in self.intro_markup
                         )
                         + "\n"
                     )
@@ -379,247 +1077,592 @@ class Deck:
 
             return banner
 
+        def _render_blocks(self, run):
+            """Return the text displayed for each codeblock."""
+
+            rendered = []
+            displays = self.displays
+            for i, display in enumerate(displays):
+                last_block = i == len(displays) - 1
+                shown = []
+
+                if not run:
+                    display = self._strip_display(display)
+
+                for j, l in enumerate(display):
+                    # this allows for multiline strings in slides
+                    # that will display as code, but not actually run
+                    # as anything more than a string (and also not be
+                    # anything more than a plain string in the source file)
+                    if l.strip() == '"""':
+                        continue
+
+                    ps1 = self.deck.ps1
+                    ps2 = self.deck.ps2
+
+                    if j == 0:
+                        to_show = ps1 + l
+                    elif (
+                        l.startswith(" ")
+                        or l.startswith(")")
+                        or l.startswith("]")
+                    ):
+                        to_show = ps2 + l
+                    elif not l.isspace():
+                        to_show = ps1 + l
+                    else:
+                        to_show = l
+
+                    shown.append(to_show)
+
+                shown = "".join(shown)
+
+                if last_block:
+                    shown = shown.rstrip() + "\n"
+                rendered.append(self.deck._highlight_text(shown))
+            return rendered
+
+        def _strip_display(self, display):
+            end = len(display)
+            while end > 1 and not display[end - 1].strip():
+                end -= 1
+            return display[:end]
+
         def run(self, run=True, echo=True):
             if run is True and echo and self.no_exec:
                 run = False
 
-            for i, (display, co) in enumerate(self.codeblocks):
-                last_block = i == len(self.codeblocks) - 1
-
-                no_echo = self.no_echo
-                if echo and not no_echo:
-                    shown = []
-
-                    if not run:
-                        while not display[-1].strip():
-                            display.pop(-1)
-
-                    for j, l in enumerate(display):
-                        # this allows for multiline strings in slides
-                        # that will display as code, but not actually run
-                        # as anything more than a string (and also not be
-                        # anything more than a plain string in the source file)
-                        if l.strip() == '"""':
-                            continue
-
-                        ps1 = self.deck.ps1
-                        ps2 = self.deck.ps2
-
-                        if j == 0:
-                            to_show = ps1 + l
-                        elif (
-                            l.startswith(" ")
-                            or l.startswith(")")
-                            or l.startswith("]")
-                        ):
-                            to_show = ps2 + l
-                        elif not l.isspace():
-                            to_show = ps1 + l
-                        else:
-                            to_show = l
-
-                        to_show = to_show
-
-                        if (
-                            not run
-                            and not self.never_exec
-                            and last_block
-                            and j == len(display) - 1
-                        ):
-                            self.deck._exec_on_return = True
-
-                        shown.append(to_show)
+            echo = echo and not self.no_echo
+            displays = self.displays
+            if echo:
+                rendered = self.deck._frame(self).blocks(bool(run))
+
+                def show(i):
+                    display = displays[i]
+                    if (
+                        not run
+                        and not self.never_exec
+                        and i == len(displays) - 1
+                        and self._strip_display(display)[-1].strip() != '"""'
+                    ):
+                        self.deck._exec_on_return = True
 
                     Deck._add_history("".join(display).rstrip())
-                    shown = "".join(shown)
+                    self.deck._screen.write(rendered[i])
 
-                    if last_block:
-                        shown = shown.rstrip() + "\n"
-                    sys.stdout.write(self.deck._highlight_text(shown))
+            else:
+                show = None
 
-                if run and not self.never_exec:
-                    try:
-                        exec(co, environ)
-                    except:
-                        traceback.print_exc()
+            if run and not self.never_exec:
+                self.deck._run_codeblocks(self, show)
+            elif show is not None:
+                for i in range(len(displays)):
+                    show(i)
             if run:
                 print("")
+            return bool(run) and not self.never_exec and bool(displays)
 
         def __str__(self):
-            return "".join(self.lines)
+            return self.source
 
-        def _append(self, line):
-            self.lines.append(line)
-            if not self._stack and line.isspace():
+        def _append(self, start, line):
+            if not self._spans and line.isspace():
                 return
-            indent = len(line) - len(line.lstrip())
-            if not self._stack:
-                self._level = indent
-            elif indent <= self._level:
-                try:
-                    co = self._compile()
-                    if co:
-                        self.codeblocks.append((self._pop(), co))
-                except SyntaxError:
-                    pass
-            self._stack.append(line)
+            end = start + len(line)
+            if self._spans and self._spans[-1][1] == start:
+                self._spans[-1] = (self._spans[-1][0], end)
+            else:
+                self._spans.append((start, end))
 
         def _close(self):
-            if self._stack:
-                co = self._compile()
-                assert co
-                self.codeblocks.append((self._pop(), co))
-
             if self.intro:
                 while not self.intro[-1].strip():
                     self.intro.pop(-1)
 
-        def _compile(self):
-            style = getattr(self, "no_return", False) and "exec" or "single"
-            try:
-                return code.compile_command(
-                    "".join(self._stack), "<input>", style
+            # styled spans are worked out once here, rather than on
+            # every display
+            if self.title:
+                self.title_markup = render.parse_markup(
+                    "*** " + self.title + " ***"
                 )
-            except:
-                print("code:", "".join(self._stack))
-                raise
+            self.intro_markup = [render.parse_markup(l) for l in self.intro]
+            self.bullet_markup = [
+                render.compile_bullet(bullet, self.deck.bullet_width)
+                for bullet in self.bullets
+            ]
+
+        def _line_number(self, lineno):
+            """Return the line in the file of a line of the code."""
+
+            for start, end in self._spans:
+                count = self._buffer.count("\n", start, end)
+                if lineno <= count:
+                    return (
+                        self._first_line
+                        + self._buffer.count("\n", self._offset, start)
+                        + lineno
+                    )
+                lineno -= count
+            return (
+                self._first_line
+                + self._buffer.count("\n", self._offset, self._spans[-1][1])
+                + 1
+            )
+
+        def _describe_error(self, err):
+            return "%s:%d: %s" % (
+                self.file,
+                self._line_number(err.lineno or 1),
+                err.msg,
+            )
 
-        def _pop(self):
-            self._stack.reverse()
-            lines = list(self._stack)
-            lines.reverse()
-            self._stack = []
-            return lines
+        def _split(self):
+            if self._blocks is None:
+                try:
+                    self._blocks = self._find_blocks()
+                except SyntaxError as err:
+                    # reported by whatever shows or runs the slide
+                    self.error = "%s; slide %s won't run" % (
+                        self._describe_error(err),
+                        self.index,
+                    )
+                    self.no_exec = self.never_exec = True
+                    self._blocks = ((0, len(_split_lines(self.source))),)
+            return self._blocks
+
+        def _find_blocks(self):
+            """Return the source lines of each top level statement, as
+            (first, last + 1) pairs.
+
+            Raises SyntaxError if the code doesn't parse.
+
+            """
+            source = self.source
+            tree = ast.parse(source, "<input>")
+            if not tree.body:
+                return ()
+
+            # statements sharing a line, e.g. "x = 1; y = 2", share a block
+            starts = sorted(
+                {
+                    min(
+                        [node.lineno]
+                        + [
+                            d.lineno
+                            for d in getattr(node, "decorator_list", ())
+                        ]
+                    )
+                    - 1
+                    for node in tree.body
+                }
+            )
+            starts[0] = 0
+            ends = starts[1:] + [len(_split_lines(source))]
+            return tuple(zip(starts, ends))
 
     @classmethod
     def run(cls, path: Optional[Path] = None, **options):
-        """Run an interactive session for a Deck and exit when complete."""
+        """Run an interactive session for a Deck and exit when complete.
+
+        If a ``ready`` callable is passed, it's called once the deck is
+        parsed and the setup slide has run, just before the console
+        starts.  ``slide`` starts the session at that slide.
+
+        """
         if path is None:
             path = Path(sys.argv[0])
 
-        _goto = None
-        while True:
-            deck = cls.from_path(path, **options)
-            if not deck:
-                sys.stderr.write("Aborting: no slides!\n")
-                sys.exit(-1)
+        ready = options.get("ready")
+        if options.get("run_all"):
+            # report every syntax error before running anything
+            options["validate"] = True
 
-            deck.start()
+        global environ
 
-            if options.get("run_all"):
-                deck.goto(len(deck.slides))
-                sys.exit(0)
+        use_kernel = options.get("kernel", False)
+        if use_kernel:
+            from . import kernel
 
-            global environ
-            environ = {"__name__": "__console__", "__doc__": None}
+            if not kernel.available():
+                print(
+                    "% --kernel isn't available here, "
+                    "running code in-process"
+                )
+                use_kernel = False
 
-            # environ['environ'] = environ  # useful for debugging
+        if use_kernel and options.get("mem"):
+            # the namespace lives in the kernel's process
+            print("% --mem isn't used with --kernel")
+            options["mem"] = None
 
-            console = code.InteractiveConsole(locals=environ)
+        if options.get("watch") and options.get("lazy"):
+            # slides have to be parsed to be compared
+            print("% --lazy isn't used with --watch")
+            options["lazy"] = False
 
-            deck.setup_environ(environ)
+        broadcast = None
+        if options.get("serve"):
+            from . import broadcast as broadcasting
 
-            if deck.init_slide:
-                for _, co in deck.init_slide.codeblocks:
-                    exec(co, environ)
-                print("%% executed initial setup slide.")
+            if not broadcasting.available():
+                print("% --serve isn't available here")
+            else:
+                broadcast = broadcasting.Broadcast(options["serve"])
+                if broadcast.start():
+                    broadcast.tee()
+                else:
+                    broadcast = None
 
-            if _goto:
-                deck.goto(_goto)
+        timer = None
+        if options.get("timer") is not None:
+            from . import timer as timing
 
-            console.raw_input = deck.readfunc
-            if readline:
-                readline.parse_and_bind("tab: complete")
-                readline.set_completer(rlcompleter.Completer(environ).complete)
-            try:
-                console.interact(deck.banner if _goto is None else "")
-            except ReallyRerun as rr:
-                _goto = rr.slide
+            timer = timing.Timer(
+                options["timer"],
+                options.get("timer_log") or "%s.timer.jsonl" % Path(path).stem,
+            )
+
+        runner = None
+        if options.get("asyncio"):
+            if use_kernel:
+                print("% --asyncio isn't used with --kernel")
+                options["asyncio"] = False
+            elif not hasattr(ast, "PyCF_ALLOW_TOP_LEVEL_AWAIT"):
+                print("% --asyncio needs Python 3.8 or later")
+                options["asyncio"] = False
             else:
-                break
-            finally:
-                if readline:
-                    # otherwise has history in the input() function used by the
-                    # menu
-                    readline.clear_history()
+                from . import aio
+
+                runner = aio.Runner()
+                if options.get("checkpoints") == "fork":
+                    # a forked copy would share the loop's selector and
+                    # sockets with the original
+                    print(
+                        "% fork checkpoints aren't used with --asyncio, "
+                        "using pickle"
+                    )
+                    options["checkpoints"] = "pickle"
+
+        if options.get("watch") and not (
+            use_kernel or options.get("checkpoints")
+        ):
+            # slides whose code changes run again from a checkpoint,
+            # rather than on top of what they left behind
+            options["checkpoints"] = "pickle"
+
+        if use_kernel and options.get("checkpoints"):
+            # the namespace lives in the kernel, out of reach of both
+            print("% checkpoints aren't used with --kernel")
+            checkpoints = None
+        else:
+            checkpoints = checkpoint.create(
+                options.get("checkpoints"),
+                limit=options.get("checkpoint_limit") or 16,
+                memory_limit=(options.get("checkpoint_memory") or 0)
+                * 1024**2,
+            )
+        _kernel = None
+        _goto = options.get("slide")
+        restored: Optional[RestoreCheckpoint] = None
+        deck = None
+        try:
+            while True:
+                if deck is None or restored is None or restored.reload:
+                    deck = cls.from_path(path, **options)
+                    if not deck:
+                        sys.stderr.write("Aborting: no slides!\n")
+                        sys.exit(-1)
+
+                    deck.start()
+                    if options.get("watch"):
+                        from . import watch
+
+                        deck.watcher = watch.Watcher(deck)
+
+                deck.checkpoints = checkpoints
+                deck.broadcast = broadcast
+                deck.timer = timer
+                deck.runner = runner
+                try:
+                    if restored is not None:
+                        # we're a checkpoint that was just resumed; environ
+                        # is as it was after slide restored.slide ran
+                        deck.current = restored.slide
+                        deck._exec_on_return = False
+                        _goto = restored.goto
+                        if timer is not None:
+                            timer.discard()
+                        restored = None
+                    else:
+                        if checkpoints is not None:
+                            checkpoints.invalidate(deck)
+                        environ = {"__name__": "__console__", "__doc__": None}
+                        if use_kernel:
+                            if _kernel is not None:
+                                _kernel.close()
+                            _kernel = deck.kernel = kernel.Kernel(deck)
+                            if _kernel.start():
+                                print("%% executed initial setup slide.")
+                        elif not (
+                            _goto and deck._restore_checkpoint(_goto, True)
+                        ):
+                            # environ['environ'] = environ  # for debugging
+
+                            deck.setup_environ(environ)
+
+                            if deck.init_slide:
+                                for idx, co in enumerate(deck.init_slide.code):
+                                    if (
+                                        deck._profiler is None
+                                        and deck._memory is None
+                                    ):
+                                        deck._run_code(co)
+                                    else:
+                                        with deck._measure(
+                                            deck.init_slide, idx
+                                        ):
+                                            deck._run_code(co)
+                                print("%% executed initial setup slide.")
+                            deck._checkpoint(0)
+
+                    if ready is not None:
+                        ready()
+                        ready = None
+
+                    if options.get("run_all"):
+                        failed = deck._fast_forward(len(deck.slides))
+                        if failed and deck.skipped_output == "capture":
+                            deck.skipped()
+                        print(
+                            "%% Ran %d slides, %d raised an exception."
+                            % (len(deck.slides), len(set(failed)))
+                        )
+                        sys.exit(1 if failed else 0)
+
+                    if _kernel is not None:
+                        console = kernel.Console(_kernel)
+                    elif runner is not None:
+                        console = aio.Console(environ, runner)
+                    else:
+                        console = code.InteractiveConsole(locals=environ)
+
+                    if _goto:
+                        deck.goto(_goto)
+
+                    console.raw_input = deck.readfunc
+                    console.runsource = deck._runsource(console.runsource)
+                    if readline:
+                        readline.parse_and_bind("tab: complete")
+                        readline.set_completer(
+                            _kernel.complete
+                            if _kernel is not None
+                            else rlcompleter.Completer(environ).complete
+                        )
+                    console.interact(deck.banner if _goto is None else "")
+                except ReallyRerun as rr:
+                    _goto = rr.slide
+                except SwitchDeck as sd:
+                    print("%% Switching to %s" % sd.path)
+                    path, _goto, deck = sd.path, sd.slide, None
+                except RestoreCheckpoint as rc:
+                    restored = rc
+                else:
+                    break
+                finally:
+                    if readline and restored is None:
+                        # otherwise has history in the input() function used
+                        # by the menu
+                        readline.clear_history()
+        finally:
+            terminal.leave()
+            if _kernel is not None:
+                _kernel.close()
+            if checkpoints is not None:
+                checkpoints.close()
+            if broadcast is not None:
+                broadcast.close()
+            if runner is not None:
+                runner.close()
+            if timer is not None:
+                timer.close()
 
     @classmethod
     def from_path(cls, path: Path, **options: Any) -> Deck:
         """Create a Deck from slides embedded in a file at path."""
 
         deck = cls(path, **options)
-        cls._slides_from_file(path, deck)
+        if options.get("lazy"):
+            from . import lazy
+
+            lazy.load(deck)
+            parsed = False
+        elif deck.use_cache and cache.load(deck):
+            parsed = False
+        else:
+            cls._slides_from_file(path, deck)
+            parsed = True
+
+        if options.get("validate"):
+            errors = deck._validate()
+            for slide, err in errors:
+                print("%% %s" % slide._describe_error(err))
+            if errors:
+                raise errors[0][1]
+
+        if deck.use_cache and parsed:
+            cache.store(deck)
         return deck
 
+    def _validate(self):
+        """Split the code of every slide into codeblocks now rather than
+        when it's first displayed.
+
+        Returns (slide, SyntaxError) for each slide whose code doesn't
+        parse.
+
+        """
+        errors = []
+        slides = [self.init_slide] if self.init_slide else []
+        # self.slides isn't a list for a lazily loaded deck
+        for slide in itertools.chain(slides, self.slides):
+            if slide._blocks is None:
+                try:
+                    slide._blocks = slide._find_blocks()
+                except SyntaxError as err:
+                    errors.append((slide, err))
+        return errors
+
     @classmethod
     def _slides_from_file(cls, path, deck):
-        s_re = re.compile(r"### +slide::(.+)?$")
-        f_re = re.compile(r"### +file::(.+)$")
-        t_re = re.compile(r"### +title::(.+)$")
-        t_re_2 = re.compile(r"^#####* (.+) #####*$")
-        b_re = re.compile(r"^###( +\* .+)$")
+        for slide in cls._parse_file(path, deck):
+            slide.index = len(deck.slides) + 1
+            if slide.init:
+                deck.init_slide = slide
+            else:
+                deck.slides.append(slide)
 
-        c_re = re.compile(r"#(?: (.*))?$")
+    @classmethod
+    def _parse_file(cls, path, deck):
+        """Yield completed slides from the file at path, in a single pass.
 
-        slide = None
+        ``### file::`` includes are followed in place.  A slide is
+        complete once the next ``### slide::`` marker is seen.
+
+        """
+        abspath = os.path.abspath(path)
+        reusable = deck._reusable.pop(abspath, None)
+        if reusable is not None:
+            files, slides = reusable
+            try:
+                unchanged = files == [cache.file_stamp(p) for p, _, _ in files]
+            except OSError:
+                unchanged = False
+            if unchanged:
+                deck.source_files.extend(p for p, _, _ in files)
+                deck._parsed_files[abspath] = reusable
+                for p, _, _ in files[1:]:
+                    if p in deck._reusable:
+                        deck._parsed_files[p] = deck._reusable.pop(p)
+                yield from slides
+                return
+
+        first = len(deck.source_files)
+        deck.source_files.append(abspath)
         with open(path) as fh:
-            lines = list(fh)
-        while lines:
-            line = lines.pop(0)
-            m = f_re.match(line)
+            buffer = fh.read()
+        if deck._parsed_files is None:
+            yield from cls._parse_text(path, deck, buffer)
+            return
+
+        slides = []
+        for slide in cls._parse_text(path, deck, buffer):
+            slides.append(slide)
+            yield slide
+        deck._parsed_files[abspath] = (
+            [cache.file_stamp(p) for p in deck.source_files[first:]],
+            slides,
+        )
+
+    @classmethod
+    def _parse_text(
+        cls,
+        path,
+        deck,
+        buffer,
+        follow_includes=True,
+        final=False,
+        first_line=0,
+    ):
+        """Yield completed slides from buffer, the text of the file at
+        path.
+
+        With follow_includes false, ``### file::`` lines are skipped
+        rather than followed.  With final, the slide still open at the
+        end of the text is yielded as well.  first_line is the line number
+        in the file of the start of buffer.
+
+        """
+        slide = None
+        counted = 0
+        lines = _offset_lines(buffer)
+        for start, line in lines:
+            m = _file_re.match(line)
             if m:
-                f_path = os.path.normpath(
-                    os.path.join(os.path.dirname(path), m.group(1).strip())
-                )
-                cls._slides_from_file(f_path, deck)
-                if lines and not f_re.match(lines[0]):
-                    lines.pop(0)  # suppress next line
+                while m:
+                    f_path = os.path.normpath(
+                        os.path.join(os.path.dirname(path), m.group(1).strip())
+                    )
+                    if follow_includes:
+                        yield from cls._parse_file(f_path, deck)
+
+                    # the line following an include is suppressed,
+                    # unless it's another include
+                    m = _file_re.match(next(lines, (0, ""))[1])
                 continue
 
-            m = t_re.match(line)
+            m = _title_re.match(line)
             if not m:
-                m = t_re_2.match(line)
+                m = _title_re_2.match(line)
             if m:
                 if slide:
                     slide.title = m.group(1).strip()
                     slide.intro = []
-                    slide.lines = []
                 continue
 
             if slide and slide.has_bullets:
-                m = b_re.match(line)
+                m = _bullet_re.match(line)
                 if m:
                     slide.bullets.append(m.group(1).rstrip())
                     continue
 
             if slide:
-                m = c_re.match(line)
+                m = _comment_re.match(line)
                 if m:
                     if m.group(1):
                         slide.intro.append(m.group(1).rstrip())
                     else:
                         slide.intro.append("")
                     continue
-                elif not line.isspace():
-                    slide.lines = []
-                elif slide.intro:
+                elif line.isspace() and slide.intro:
                     slide.intro.append("")
 
-            m = s_re.match(line)
+            m = _slide_re.match(line)
             if not m:
                 if slide:
-                    if not line.isspace() or slide.lines:
-                        slide._append(line)
+                    slide._append(start, line)
                 continue
 
             if slide:
                 slide._close()
-                if getattr(slide, "init", False):
-                    deck.init_slide = slide
-                else:
-                    deck.slides.append(slide)
-
-            slide = cls.Slide(deck, file=fh.name, index=len(deck.slides) + 1)
+                yield slide
+
+            slide = cls.Slide(deck, file=str(path), index=None, buffer=buffer)
+            # lines are counted as slides start, so that a slide's line
+            # numbers are worked out from its own text
+            first_line += buffer.count("\n", counted, start)
+            counted = start
+            slide._offset = start
+            slide._first_line = first_line
             opts = m.group(1)
             if opts:
                 for opt in opts:
@@ -636,6 +1679,14 @@ class Deck:
                         break
                     elif opt == "b":
                         slide.has_bullets = True
+                    elif opt == "m":
+                        slide.memo = True
+                    elif opt == "a":
+                        slide.always_exec = True
+
+        if final and slide:
+            slide._close()
+            yield slide
 
     def show_banner(self):
         print(self.banner)
@@ -658,7 +1709,17 @@ class Deck:
         if self._exec_on_return:
             prompt = "\n[press return to run code]"
 
-        line = input(prompt)
+        if self.watcher is not None and prompt == self.ps1:
+            if self.broadcast is not None:
+                self.broadcast.flush()
+            line = self.watcher.input(prompt)
+            if line is None:
+                # the deck was reloaded
+                return ""
+            if self.broadcast is not None:
+                self.broadcast.output(prompt + line + "\n")
+        else:
+            line = self._input(prompt)
         if self._exec_on_return or prompt == self.ps1:
             tokens = line.split()
             if self._exec_on_return or line == "":
@@ -685,11 +1746,41 @@ class Deck:
                 return ""
         return line
 
+    def _runsource(self, runsource):
+        """Wrap a console's runsource(), so that code typed at the prompt
+        that needs what !goto skipped has it run first."""
+
+        def run(source, filename="<input>", symbol="single"):
+            if self._behind and source.strip():
+                # source is everything typed for the statement so far;
+                # until it's complete it doesn't parse
+                try:
+                    names = deps.analyze(source)
+                except (SyntaxError, ValueError):
+                    pass
+                else:
+                    self._catch_up(None if names.opaque else names.reads)
+            return runsource(source, filename, symbol)
+
+        return run
+
+    def _input(self, prompt):
+        if self.broadcast is not None:
+            self.broadcast.flush()
+        line = input(prompt)
+        # what's typed is echoed by the terminal, not written to stdout
+        if self.broadcast is not None:
+            self.broadcast.output(prompt + line + "\n")
+        return line
+
     def _decolorize(self, text):
-        return re.sub(r"\!\!\{.+?}", "", text)
+        return "".join(token for _, token in render.parse_markup(text).spans)
 
     def _color(self, text, color_style):
-        return self._decolorize(text)
+        return self._render_markup(render.parse_markup(text), color_style)
+
+    def _render_markup(self, markup, style):
+        return "".join(token for _, token in markup.spans)
 
     def _highlight_text(self, text):
         return text
@@ -0,0 +1,181 @@
+# sliderepl
+#   Copyright (c) Michael Bayer <mike_mp@zzzcomputing.com>
+#   sliderepl is released under the MIT License:
+#   http://www.opensource.org/licenses/mit-license.php
+"""Which names each codeblock binds and reads.
+
+With ``--minimal-replay``, ``!goto`` runs only those earlier codeblocks
+that the destination slide depends on, directly or through other
+codeblocks, rather than every codeblock in between.  The analysis is
+static and errs on the side of running a block:
+
+* a name counts as bound by a block if the block assigns it, imports
+  it, deletes it, assigns to an attribute or item of it, calls a method
+  on it, or passes it to a function, since any of these may change what
+  a later block sees
+* a name counts as read if it's used anywhere in the block, including
+  inside the bodies of functions and classes it defines
+* a block using ``from x import *``, ``exec()``, ``globals()`` and the
+  like can't be analyzed and always runs
+
+Side effects outside the namespace, such as writing to a database or a
+file, can't be seen at all; slides marked ``### slide::a`` always run.
+
+"""
+from __future__ import annotations
+
+import ast
+from typing import FrozenSet
+from typing import Hashable
+from typing import List
+from typing import NamedTuple
+from typing import Sequence
+from typing import Set
+from typing import Tuple
+
+# calls that reach into the namespace by other means than a name
+_opaque_calls = frozenset(
+    ["exec", "eval", "globals", "locals", "vars", "__import__"]
+)
+
+
+class Names(NamedTuple):
+    binds: FrozenSet[str]
+    reads: FrozenSet[str]
+    opaque: bool
+
+
+def _root(node: ast.AST) -> ast.AST:
+    while isinstance(node, (ast.Attribute, ast.Subscript, ast.Call)):
+        node = node.func if isinstance(node, ast.Call) else node.value
+    return node
+
+
+class _Visitor(ast.NodeVisitor):
+    def __init__(self) -> None:
+        self.binds: Set[str] = set()
+        self.reads: Set[str] = set()
+        self.opaque = False
+        self._depth = 0
+
+    def _bind(self, name: str) -> None:
+        if self._depth == 0:
+            self.binds.add(name)
+
+    def _scope(self, node: ast.AST) -> None:
+        self._depth += 1
+        self.generic_visit(node)
+        self._depth -= 1
+
+    def visit_Name(self, node: ast.Name) -> None:
+        if isinstance(node.ctx, ast.Load):
+            self.reads.add(node.id)
+        else:
+            self._bind(node.id)
+
+    def visit_FunctionDef(self, node: ast.AST) -> None:
+        self._bind(node.name)
+        self._scope(node)
+
+    visit_AsyncFunctionDef = visit_ClassDef = visit_FunctionDef
+
+    visit_Lambda = visit_ListComp = visit_SetComp = _scope
+    visit_DictComp = visit_GeneratorExp = _scope
+
+    def visit_Global(self, node: ast.Global) -> None:
+        self.binds.update(node.names)
+
+    def visit_Import(self, node: ast.Import) -> None:
+        for alias in node.names:
+            self._bind(alias.asname or alias.name.split(".")[0])
+
+    def visit_ImportFrom(self, node: ast.ImportFrom) -> None:
+        for alias in node.names:
+            if alias.name == "*":
+                self.opaque = True
+            else:
+                self._bind(alias.asname or alias.name)
+
+    def visit_ExceptHandler(self, node: ast.ExceptHandler) -> None:
+        if node.name:
+            self._bind(node.name)
+        self.generic_visit(node)
+
+    def visit_MatchAs(self, node: ast.AST) -> None:
+        if node.name:
+            self._bind(node.name)
+        self.generic_visit(node)
+
+    visit_MatchStar = visit_MatchAs
+
+    def visit_MatchMapping(self, node: ast.AST) -> None:
+        if node.rest:
+            self._bind(node.rest)
+        self.generic_visit(node)
+
+    def _mutate(self, node: ast.AST) -> None:
+        root = _root(node)
+        if isinstance(root, ast.Name):
+            self.binds.add(root.id)
+
+    def visit_Attribute(self, node: ast.Attribute) -> None:
+        if not isinstance(node.ctx, ast.Load):
+            self._mutate(node)
+        self.generic_visit(node)
+
+    visit_Subscript = visit_Attribute
+
+    def _pass(self, node: ast.AST) -> None:
+        # a function may change what it's passed, or keep hold of it; an
+        # argument that's itself a call is visited on its own
+        while isinstance(node, (ast.Attribute, ast.Subscript, ast.Starred)):
+            node = node.value
+        if isinstance(node, ast.Name):
+            self.binds.add(node.id)
+
+    def visit_Call(self, node: ast.Call) -> None:
+        if isinstance(node.func, ast.Attribute):
+            self._mutate(node.func)
+        elif isinstance(node.func, ast.Name) and (
+            node.func.id in _opaque_calls
+        ):
+            self.opaque = True
+        for arg in node.args:
+            self._pass(arg)
+        for keyword in node.keywords:
+            self._pass(keyword.value)
+        self.generic_visit(node)
+
+
+def analyze(source: str) -> Names:
+    """Return the names the codeblock ``source`` binds and reads.
+
+    Raises SyntaxError if ``source`` doesn't parse.
+
+    """
+    visitor = _Visitor()
+    visitor.visit(ast.parse(source))
+    return Names(
+        frozenset(visitor.binds), frozenset(visitor.reads), visitor.opaque
+    )
+
+
+def plan(
+    blocks: Sequence[Tuple[Hashable, Names, bool]], needed: Set[str]
+) -> List[Hashable]:
+    """Return the keys of the blocks that have to run for the names in
+    ``needed`` to be as they would be had every block run.
+
+    ``blocks`` are ``(key, names, always)`` tuples in the order the
+    blocks would run; ``always`` marks a block that runs regardless.
+    The keys come back in the same order.
+
+    """
+    needed = set(needed)
+    chosen = []
+    for key, names, always in reversed(blocks):
+        if always or names.opaque or not names.binds.isdisjoint(needed):
+            chosen.append(key)
+            needed |= names.reads
+    chosen.reverse()
+    return chosen
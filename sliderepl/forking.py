@@ -0,0 +1,200 @@
+# sliderepl
+#   Copyright (c) Michael Bayer <mike_mp@zzzcomputing.com>
+#   sliderepl is released under the MIT License:
+#   http://www.opensource.org/licenses/mit-license.php
+"""Paused copies of the running process.
+
+:func:`fork_paused` forks a copy of the current process that sleeps until
+it's handed control with :meth:`.Paused.resume`; :func:`fork_running`
+forks a copy that first does some work of its own, then sleeps.  The
+process that resumes a copy then waits for it to finish, so the copy
+effectively takes over the session, terminal included.
+
+POSIX only.
+
+"""
+from __future__ import annotations
+
+from contextlib import contextmanager
+import os
+import pickle
+import signal
+import struct
+import sys
+import traceback
+from typing import Any
+from typing import Callable
+from typing import Iterator
+from typing import Optional
+from typing import Tuple
+
+_header = struct.Struct("!I")
+
+# write end of the pipe our resumer waits on; it sees EOF when we exit
+_report_fd: Optional[int] = None
+
+
+@contextmanager
+def _ignoring_sigint() -> Iterator[None]:
+    # Ctrl-C goes to the whole foreground process group; only the process
+    # that's currently in charge of the session should act on it
+    prev = signal.signal(signal.SIGINT, signal.SIG_IGN)
+    try:
+        yield
+    finally:
+        signal.signal(signal.SIGINT, prev)
+
+
+def _read_exactly(fd: int, size: int) -> bytes:
+    data = b""
+    while len(data) < size:
+        chunk = os.read(fd, size - len(data))
+        if not chunk:
+            break
+        data += chunk
+    return data
+
+
+def close_report_fd() -> None:
+    """Close the inherited report pipe in a newly forked child."""
+
+    global _report_fd
+    if _report_fd is not None:
+        os.close(_report_fd)
+        _report_fd = None
+
+
+class Paused:
+    """Handle to a paused copy of this process."""
+
+    def __init__(self, pid: int, ctrl_fd: int, done_fd: int):
+        self.pid = pid
+        self._ctrl_fd = ctrl_fd
+        self._done_fd = done_fd
+
+    def resume(self, message: Any) -> int:
+        """Hand control to the paused copy.
+
+        Blocks until the copy exits and returns its exit status.  Raises
+        OSError if the copy is no longer around to be resumed.
+
+        """
+        data = pickle.dumps(message)
+        try:
+            os.write(self._ctrl_fd, _header.pack(len(data)) + data)
+        finally:
+            os.close(self._ctrl_fd)
+
+        with _ignoring_sigint():
+            while os.read(self._done_fd, 4096):
+                pass
+            os.close(self._done_fd)
+            try:
+                _, status = os.waitpid(self.pid, 0)
+            except ChildProcessError:
+                # resumed a copy forked by an ancestor of ours
+                return 0
+        if os.WIFSIGNALED(status):
+            return 128 + os.WTERMSIG(status)
+        return os.WEXITSTATUS(status)
+
+    def discard(self) -> None:
+        """Terminate the paused copy without resuming it."""
+
+        os.close(self._ctrl_fd)
+        os.close(self._done_fd)
+        try:
+            os.kill(self.pid, signal.SIGTERM)
+            os.waitpid(self.pid, 0)
+        except (ProcessLookupError, ChildProcessError):
+            pass
+
+    def memory_size(self) -> int:
+        """Bytes of memory private to the paused copy, where known."""
+
+        try:
+            with open(f"/proc/{self.pid}/smaps_rollup") as fh:
+                return sum(
+                    int(line.split()[1]) * 1024
+                    for line in fh
+                    if line.startswith(("Private_Clean:", "Private_Dirty:"))
+                )
+        except (OSError, ValueError, IndexError):
+            return 0
+
+
+def _fork() -> Tuple[Optional[Paused], int, int]:
+    ctrl_r, ctrl_w = os.pipe()
+    done_r, done_w = os.pipe()
+    sys.stdout.flush()
+    sys.stderr.flush()
+
+    pid = os.fork()
+    if pid:
+        os.close(ctrl_r)
+        os.close(done_w)
+        return Paused(pid, ctrl_w, done_r), -1, -1
+
+    os.close(ctrl_w)
+    os.close(done_r)
+    close_report_fd()
+    return None, ctrl_r, done_w
+
+
+def _wait(ctrl_r: int, done_w: int) -> Any:
+    global _report_fd
+
+    with _ignoring_sigint():
+        header = _read_exactly(ctrl_r, _header.size)
+        if len(header) < _header.size:
+            os._exit(0)
+        (size,) = _header.unpack(header)
+        message = pickle.loads(_read_exactly(ctrl_r, size))
+    os.close(ctrl_r)
+
+    _report_fd = done_w
+    return message
+
+
+def fork_paused() -> Tuple[Optional[Paused], Any]:
+    """Fork a paused copy of this process.
+
+    Returns ``(paused, None)`` in the calling process.  In the copy, the
+    call returns ``(None, message)`` once another process resumes it with
+    ``message``.
+
+    """
+    paused, ctrl_r, done_w = _fork()
+    if paused is not None:
+        return paused, None
+    return None, _wait(ctrl_r, done_w)
+
+
+def fork_running(target: Callable[[Callable[[], Any]], Any]) -> Paused:
+    """Fork a copy of this process that calls ``target(wait)``, and
+    return a handle on it.
+
+    The copy gets on with ``target`` right away; calling ``wait()`` pauses
+    it until it's resumed with :meth:`.Paused.resume`, returning the
+    message it was resumed with.  The copy exits once ``target`` returns.
+
+    """
+    paused, ctrl_r, done_w = _fork()
+    if paused is not None:
+        return paused
+
+    status = 0
+    try:
+        target(lambda: _wait(ctrl_r, done_w))
+    except SystemExit as se:
+        if isinstance(se.code, int):
+            status = se.code
+        elif se.code is not None:
+            status = 1
+    except BaseException:
+        traceback.print_exc()
+        status = 1
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(status)
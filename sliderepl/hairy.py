@@ -1,29 +1,161 @@
+from functools import lru_cache
 import re
 import sys
 
-from pygments import highlight
-from pygments.formatters import TerminalFormatter
-from pygments.formatters.terminal import TERMINAL_COLORS
-from pygments.lexers import get_lexer_by_name
-from pygments.token import Comment
-from termcolor import colored
-
 from . import core
 
+# pygments and termcolor are imported on first use; pygments in
+# particular takes a while to import and to look up a lexer
+
+
+@lru_cache(maxsize=None)
+def _lexer(name):
+    if name == "pycon":
+        # skips the search through installed plugins
+        from pygments.lexers.python import PythonConsoleLexer
+
+        return PythonConsoleLexer()
+
+    from pygments.lexers import get_lexer_by_name
+
+    return get_lexer_by_name(name)
+
+
+@lru_cache(maxsize=None)
+def _formatter(bg):
+    from pygments.formatters import TerminalFormatter
+    from pygments.formatters.terminal import TERMINAL_COLORS
+    from pygments.token import Comment
+
+    scheme = TERMINAL_COLORS.copy()
+    scheme[Comment] = ("blue", "cyan")
+    return TerminalFormatter(bg=bg, colorscheme=scheme)
+
+
+@lru_cache(maxsize=512)
+def _highlighted(text, lexer, bg):
+    from pygments import highlight
+
+    if isinstance(lexer, str):
+        lexer = _lexer(lexer)
+    return highlight(text, lexer, _formatter(bg)).rstrip()
+
+
+def _colored(text, *style):
+    from termcolor import colored
+
+    return colored(text, *style)
 
-scheme = TERMINAL_COLORS.copy()
-scheme[Comment] = ("blue", "cyan")
 
-_pycon_lexer = get_lexer_by_name("pycon")
+def _highlight_block(text, lexer, bg):
+    from pygments import highlight
+
+    # the lexer strips leading and trailing newlines; keep them apart
+    # so that blank lines come out as they went in
+    lead, body, trail = re.match(r"(\s*)(.*?)(\s*)$", text, re.S).groups()
+    if not body:
+        return text
+    return lead + highlight(body, lexer, _formatter(bg)).rstrip() + trail
 
 
 class HighlightOutput(object):
-    def __init__(self, deck, lexer):
+    """A stdout that highlights what's written to it.
+
+    Writes are highlighted a line at a time, so a token that arrives over
+    several writes is highlighted as a whole.  Complete lines are written
+    out straight away, in order with anything else written to stdout; a
+    partial line is held back, up to ``limit`` characters, until the
+    rest of it arrives, and written out as it stands ``delay`` seconds
+    later, when the codeblock finishes, or when :meth:`flush` is called.
+    When highlighting is off or stdout isn't a terminal, writes go
+    straight through.
+
+    """
+
+    def __init__(self, deck, lexer, delay=0.05, limit=65536):
         self.deck = deck
-        self.lexer = lexer
+        self.lexer = _lexer(lexer) if isinstance(lexer, str) else lexer
+        self.delay = delay
+        self.limit = limit
+        self._pending = []
+        self._size = 0
+        self._timer = None
+        self._lock = None
+        self._tty = (None, False)
+
+    def _passthrough(self, stream):
+        if self._tty[0] is not stream:
+            isatty = getattr(stream, "isatty", None)
+            self._tty = (stream, bool(isatty and isatty()))
+        return not (self._tty[1] and self.deck._highlighting)
 
     def write(self, text):
-        sys.stdout.write(self.deck._highlight_text(text, self.lexer))
+        stream = sys.stdout
+        if self._passthrough(stream):
+            if self._pending:
+                self.flush()
+            return stream.write(text)
+
+        if self._lock is None:
+            import threading
+
+            self._lock = threading.Lock()
+        with self._lock:
+            self._pending.append(text)
+            self._size += len(text)
+            if "\n" not in text and self._size < self.limit:
+                # the rest of the line is likely on its way; wait for it,
+                # up to delay
+                self._schedule()
+                return len(text)
+            self._emit(stream, complete=True)
+        return len(text)
+
+    def flush(self):
+        if self._lock is not None:
+            with self._lock:
+                self._emit(sys.stdout)
+        sys.stdout.flush()
+
+    def _emit(self, stream, complete=False):
+        pending = "".join(self._pending)
+        if complete:
+            lines, _, partial = pending.rpartition("\n")
+            pending = lines + "\n"
+            self._pending = [partial] if partial else []
+            self._size = len(partial)
+        else:
+            self._pending = []
+            self._size = 0
+        if self._pending:
+            self._schedule()
+        else:
+            self._cancel()
+        if pending:
+            stream.write(self._highlight(pending))
+
+    def _highlight(self, text):
+        if not self.deck._highlighting:
+            return text
+        return _highlight_block(text, self.lexer, self.deck._bg)
+
+    def _schedule(self):
+        if self._timer is None:
+            import threading
+
+            self._timer = threading.Timer(self.delay, self._expire)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _cancel(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _expire(self):
+        with self._lock:
+            self._timer = None
+        self.flush()
 
     def __getattr__(self, key):
         return getattr(sys.stdout, key)
@@ -46,46 +178,64 @@ class Deck(core.Deck):
     def __init__(self, path, **options):
         core.Deck.__init__(self, path, **options)
         self._highlight = True
+        self._highlight_outputs = {}
 
-    def _color(self, text, style):
-        output = ""
-        color = "reset"
-        for token in re.split(r"(\!\!\{.+?})", text):
-            directive = re.match(r"\!\!\{(.+?)}", token)
-            if directive:
-                color = directive.group(1)
-                continue
-
-            if color == "reset":
-                output += colored(token, *self.style_lookup[style])
-            else:
-                output += colored(token, *self.style_lookup[color])
+    def _render_markup(self, markup, style):
+        return "".join(
+            _colored(token, *self.style_lookup[token_style or style])
+            for token_style, token in markup.spans
+        )
+
+    def _render_state(self):
+        return core.Deck._render_state(self) + (self._highlight, self.color)
+
+    @property
+    def _highlighting(self):
+        return self._highlight and self.color in ("auto", "light", "dark")
 
-        return output
+    @property
+    def _bg(self):
+        return self.color == "dark" and "dark" or "light"
 
     def highlight_stdout(self, lexer):
-        lexer = get_lexer_by_name(lexer)
-        return HighlightOutput(self, lexer)
+        if lexer not in self._highlight_outputs:
+            self._highlight_outputs[lexer] = HighlightOutput(self, lexer)
+        return self._highlight_outputs[lexer]
+
+    def _flush_outputs(self):
+        for output in self._highlight_outputs.values():
+            output.flush()
+
+    def _exec(self, co, slide=None, index=0):
+        # a line a codeblock left half written goes out before whatever
+        # the next one writes
+        try:
+            return core.Deck._exec(self, co, slide, index)
+        finally:
+            self._flush_outputs()
+
+    def readfunc(self, prompt=""):
+        # as does one left by what was typed at the prompt
+        self._flush_outputs()
+        return core.Deck.readfunc(self, prompt)
 
     def highlight(self):
         """Toggle code highlighting."""
         self._highlight = not self._highlight
+        _highlighted.cache_clear()
         print(
             "%% Code highlighting is now %s"
             % (self._highlight and "ON" or "OFF")
         )
 
-    def _highlight_text(self, text, lexer=_pycon_lexer):
-        bg = self.color == "dark" and "dark" or "light"
-        if self._highlight and self.color in ("auto", "light", "dark"):
+    def _highlight_text(self, text, lexer="pycon"):
+        if self._highlighting:
             whitespace = re.match(r"(.*?)(\s+)$", text, re.S)
             if whitespace:
                 text = whitespace.group(1)
                 whitespace = whitespace.group(2)
             if text.strip():
-                content = highlight(
-                    text, lexer, TerminalFormatter(bg=bg, colorscheme=scheme)
-                ).rstrip()
+                content = _highlighted(text, lexer, self._bg)
             else:
                 content = text
             if whitespace:
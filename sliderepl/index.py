@@ -0,0 +1,198 @@
+# sliderepl
+#   Copyright (c) Michael Bayer <mike_mp@zzzcomputing.com>
+#   sliderepl is released under the MIT License:
+#   http://www.opensource.org/licenses/mit-license.php
+"""An index of what's in each deck of a slides directory.
+
+For every deck the index keeps the number of slides and, per slide, the
+title, intro and bullet text and the names used in its code.  The menu
+lists slide counts and titles from it without parsing anything, and
+``!search`` and the menu's ``/`` command look through it for slides
+about a given topic.
+
+The index is kept in the cache directory next to the deck cache.  A deck
+is parsed again only when it, or one of its includes, has changed.
+
+"""
+from __future__ import annotations
+
+from contextlib import redirect_stderr
+from contextlib import redirect_stdout
+import hashlib
+import io
+import os
+from pathlib import Path
+import pickle
+from typing import Any
+from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import NamedTuple
+from typing import Sequence
+from typing import Tuple
+from typing import Type
+
+from . import cache
+from . import deps
+from . import render
+
+INDEX_VERSION = 2
+
+# search results are ranked on where the term was found
+_fields = ("title", "bullets", "intro", "code")
+
+
+class SlideInfo(NamedTuple):
+    number: int
+    title: str
+    intro: str
+    bullets: str
+    names: Tuple[str, ...]
+
+
+class DeckInfo(NamedTuple):
+    path: str
+    files: Tuple[Tuple[str, int, int], ...]
+    slides: Tuple[SlideInfo, ...]
+
+    @property
+    def title(self) -> str:
+        """The first slide title in the deck, or failing that the first
+        intro text."""
+
+        return next((slide.title or slide.intro for slide in self.slides), "")
+
+
+class Match(NamedTuple):
+    path: str
+    slide: int
+    title: str
+    field: str
+
+
+def _plain(text: str) -> str:
+    return "".join(token for _, token in render.parse_markup(text).spans)
+
+
+def _names(slide: Any) -> Iterator[str]:
+    try:
+        names = deps.analyze(slide.source)
+    except (SyntaxError, ValueError):
+        return
+    yield from names.binds
+    yield from names.reads
+
+
+def _slide_info(number: int, slide: Any) -> SlideInfo:
+    return SlideInfo(
+        number,
+        _plain(slide.title or ""),
+        " ".join(_plain(line) for line in slide.intro if line),
+        " ".join(
+            _plain(bullet.strip()[2:].replace("**", "").replace("``", ""))
+            for bullet in slide.bullets
+        ),
+        tuple(sorted(set(_names(slide)))),
+    )
+
+
+class Index:
+    """The index for a list of decks.
+
+    ``deck_cls`` is used to parse the decks, with ``options`` passed to
+    :meth:`.Deck.from_path`.
+
+    """
+
+    def __init__(self, deck_cls: Type[Any], **options: Any):
+        self.deck_cls = deck_cls
+        self.options = options
+        self.decks: Dict[str, DeckInfo] = {}
+
+    def _entry_path(self, paths: Sequence[Path]) -> Path:
+        key = "\0".join(
+            [
+                str(INDEX_VERSION),
+                f"{self.deck_cls.__module__}.{self.deck_cls.__qualname__}",
+                str(bool(self.options.get("short"))),
+            ]
+            + sorted({os.path.dirname(os.path.abspath(p)) for p in paths})
+        )
+        return cache.cache_dir() / (
+            "index-" + hashlib.sha1(key.encode()).hexdigest() + ".pickle"
+        )
+
+    def _parse(self, path: str) -> DeckInfo:
+        # parsing chatters about presentation mode and syntax errors
+        with redirect_stdout(io.StringIO()), redirect_stderr(io.StringIO()):
+            deck = self.deck_cls.from_path(path, **self.options)
+        return DeckInfo(
+            path,
+            tuple(cache.file_stamp(file) for file in deck.source_files),
+            tuple(
+                _slide_info(number, slide)
+                for number, slide in enumerate(deck.slides, 1)
+            ),
+        )
+
+    def refresh(self, paths: Sequence[Path]) -> None:
+        """Bring the index up to date with the decks at ``paths``,
+        parsing only the ones that have changed."""
+
+        use_cache = not self.options.get("no_cache")
+        entry_path = self._entry_path(paths)
+        if not self.decks and use_cache:
+            try:
+                with open(entry_path, "rb") as fh:
+                    self.decks = pickle.load(fh)
+            except Exception:
+                self.decks = {}
+
+        decks = {}
+        changed = False
+        for path in map(str, paths):
+            info = self.decks.get(path)
+            try:
+                if info is None or any(
+                    stamp != cache.file_stamp(stamp[0]) for stamp in info.files
+                ):
+                    info = self._parse(path)
+                    changed = True
+            except OSError:
+                continue
+            decks[path] = info
+
+        changed = changed or decks.keys() != self.decks.keys()
+        self.decks = decks
+        if changed and use_cache:
+            cache.write(entry_path, decks)
+
+    def search(self, term: str, limit: int = 20) -> List[Match]:
+        """Return the slides mentioning ``term``, best matches first."""
+
+        term = term.lower()
+        matches = []
+        for info in self.decks.values():
+            for slide in info.slides:
+                for rank, field in enumerate(_fields):
+                    if field == "code":
+                        found = any(
+                            term in name.lower() for name in slide.names
+                        )
+                    else:
+                        found = term in getattr(slide, field).lower()
+                    if found:
+                        matches.append(
+                            (
+                                rank,
+                                Match(
+                                    info.path,
+                                    slide.number,
+                                    slide.title or slide.intro[:60],
+                                    field,
+                                ),
+                            )
+                        )
+                        break
+        matches.sort(key=lambda match: match[0])
+        return [match for _, match in matches[:limit]]
@@ -0,0 +1,302 @@
+# sliderepl
+#   Copyright (c) Michael Bayer <mike_mp@zzzcomputing.com>
+#   sliderepl is released under the MIT License:
+#   http://www.opensource.org/licenses/mit-license.php
+"""Slide code run in a separate worker process.
+
+With ``--kernel``, the console namespace lives in a forked worker process
+rather than in the presenter.  Codeblocks and lines typed at the prompt
+are sent to the worker over a socket, and whatever they write to stdout
+and stderr is sent back as it's written.  A demo that crashes the
+interpreter or has to be killed takes only the worker down with it.
+
+Once the worker has run the setup slide, it forks an idle copy of itself
+to serve as a warm spare.  If the worker dies, the spare takes over with
+the namespace as it was right after the setup slide, and forks a new
+spare of its own.
+
+POSIX only.
+
+"""
+from __future__ import annotations
+
+import array
+import code
+import marshal
+import os
+import pickle
+import rlcompleter
+import signal
+import socket
+import struct
+import sys
+import traceback
+from typing import Any
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+from . import forking
+
+_header = struct.Struct("!I")
+
+
+def available() -> bool:
+    return hasattr(os, "fork") and hasattr(socket, "AF_UNIX")
+
+
+def _send(sock: socket.socket, message: Any, fds: Sequence[int] = ()) -> None:
+    data = pickle.dumps(message)
+    data = _header.pack(len(data)) + data
+    if fds:
+        sent = sock.sendmsg(
+            [data],
+            [(socket.SOL_SOCKET, socket.SCM_RIGHTS, array.array("i", fds))],
+        )
+        data = data[sent:]
+    sock.sendall(data)
+
+
+def _recv(sock: socket.socket) -> Tuple[Any, List[int]]:
+    """Receive a message and any file descriptors sent with it.
+
+    Raises EOFError if the other end has gone away.
+
+    """
+    fds = array.array("i")
+    header, ancdata, _, _ = sock.recvmsg(
+        _header.size, socket.CMSG_LEN(fds.itemsize)
+    )
+    for level, type_, data in ancdata:
+        if level == socket.SOL_SOCKET and type_ == socket.SCM_RIGHTS:
+            fds.frombytes(data[: len(data) - len(data) % fds.itemsize])
+    while header and len(header) < _header.size:
+        header += sock.recv(_header.size - len(header))
+    if len(header) < _header.size:
+        raise EOFError()
+
+    (size,) = _header.unpack(header)
+    data = b""
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise EOFError()
+        data += chunk
+    return pickle.loads(data), list(fds)
+
+
+class _Stream:
+    """Stands in for stdout / stderr in the worker, sending what's
+    written back to the presenter."""
+
+    def __init__(self, sock: socket.socket, name: str, real: Any):
+        self._sock = sock
+        self._name = name
+        self._real = real
+
+    def write(self, text: str) -> int:
+        if text:
+            _send(self._sock, ("out", self._name, text))
+        return len(text)
+
+    def flush(self) -> None:
+        pass
+
+    def __getattr__(self, key: str) -> Any:
+        return getattr(self._real, key)
+
+
+def _serve(sock: socket.socket, deck: Any) -> None:
+    from . import core
+
+    while True:
+        sys.stdout = _Stream(sock, "stdout", sys.__stdout__)
+        sys.stderr = _Stream(sock, "stderr", sys.__stderr__)
+        try:
+            (op, *args), fds = _recv(sock)
+        except (EOFError, OSError):
+            return
+
+        if op == "spare":
+            pid = os.fork()
+            if pid == 0:
+                sock.close()
+                sock = socket.socket(fileno=fds[0])
+                continue
+            os.close(fds[0])
+            _send(sock, ("spare", pid))
+        elif op == "complete":
+            completer = rlcompleter.Completer(core.environ)
+            matches = []
+            while True:
+                match = completer.complete(args[0], len(matches))
+                if match is None:
+                    break
+                matches.append(match)
+            _send(sock, ("complete", matches))
+        elif op in ("init", "exec"):
+            ok = True
+            signal.signal(signal.SIGINT, signal.default_int_handler)
+            try:
+                if op == "init":
+                    core.environ = {"__name__": "__console__", "__doc__": None}
+                    deck.setup_environ(core.environ)
+                    if deck.init_slide:
+                        for co in deck.init_slide.code:
+                            exec(co, core.environ)
+                else:
+                    exec(marshal.loads(args[0]), core.environ)
+            except SystemExit as se:
+                _send(sock, ("exit", se.code))
+                continue
+            except:
+                # leave out the frames up to the exec() call, as
+                # InteractiveConsole.showtraceback() does
+                ty, value, tb = sys.exc_info()
+                traceback.print_exception(ty, value, tb.tb_next)
+                ok = False
+            finally:
+                signal.signal(signal.SIGINT, signal.SIG_IGN)
+            _send(sock, ("done", ok))
+
+
+class Kernel:
+    """The presenter's handle on the worker process."""
+
+    def __init__(self, deck: Any):
+        self.deck = deck
+        self.pid: Optional[int] = None
+        self._sock: Optional[socket.socket] = None
+        self._spare: Optional[Tuple[int, socket.socket]] = None
+        self._matches: List[str] = []
+
+    def start(self) -> bool:
+        """Fork the worker and run the setup slide in it."""
+
+        ours, theirs = socket.socketpair()
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            try:
+                ours.close()
+                forking.close_report_fd()
+                signal.signal(signal.SIGINT, signal.SIG_IGN)
+                _serve(theirs, self.deck)
+            finally:
+                os._exit(0)
+        theirs.close()
+        self.pid, self._sock = pid, ours
+        ok = self._request(("init",))
+        self._fork_spare()
+        return ok
+
+    def run(self, co: Any) -> bool:
+        """Run a compiled codeblock in the worker; returns False if it
+        raised."""
+
+        return self._request(("exec", marshal.dumps(co)))
+
+    def complete(self, text: str, state: int) -> Optional[str]:
+        """readline completer for names in the worker's namespace."""
+
+        if state == 0:
+            matches = self._request(("complete", text))
+            self._matches = matches if isinstance(matches, list) else []
+        return self._matches[state] if state < len(self._matches) else None
+
+    def close(self) -> None:
+        if self._spare is not None:
+            self._spare[1].close()
+            self._spare = None
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+            self._reap(self.pid)
+
+    def _fork_spare(self) -> None:
+        ours, theirs = socket.socketpair()
+        try:
+            _send(self._sock, ("spare",), [theirs.fileno()])
+            (_, pid), _ = _recv(self._sock)
+        except (EOFError, OSError):
+            ours.close()
+        else:
+            self._spare = (pid, ours)
+        finally:
+            theirs.close()
+
+    def _request(self, message: Any) -> Any:
+        try:
+            _send(self._sock, message)
+        except OSError:
+            return self._restart()
+
+        interrupted = False
+        while True:
+            try:
+                reply, _ = _recv(self._sock)
+            except (EOFError, OSError):
+                return self._restart()
+            except KeyboardInterrupt:
+                # the worker is in our process group and got the Ctrl-C
+                # as well; a second one means it isn't listening
+                if interrupted:
+                    os.kill(self.pid, signal.SIGKILL)
+                interrupted = True
+                continue
+
+            op, *args = reply
+            if op == "out":
+                stream = sys.stdout if args[0] == "stdout" else sys.stderr
+                stream.write(args[1])
+                stream.flush()
+            elif op == "exit":
+                raise SystemExit(args[0])
+            else:
+                return args[0]
+
+    def _reap(self, pid: Optional[int]) -> Optional[int]:
+        if pid is None:
+            return None
+        try:
+            _, status = os.waitpid(pid, 0)
+        except ChildProcessError:
+            # a promoted spare isn't our child
+            return None
+        return status
+
+    def _restart(self) -> bool:
+        status = self._reap(self.pid)
+        self._sock.close()
+        self._sock = None
+
+        if status is not None and os.WIFSIGNALED(status):
+            print("%% kernel died with signal %d" % os.WTERMSIG(status))
+        else:
+            print("% kernel went away")
+
+        if self._spare is not None:
+            self.pid, self._sock = self._spare
+            self._spare = None
+            print(
+                "% switched to the warm spare kernel; the namespace is as "
+                "it was after the setup slide"
+            )
+            self._fork_spare()
+        else:
+            print("% starting a new kernel")
+            self.start()
+        return False
+
+
+class Console(code.InteractiveConsole):
+    """Console whose input is run by a :class:`.Kernel`."""
+
+    def __init__(self, kernel: Kernel):
+        code.InteractiveConsole.__init__(self, locals={})
+        self.kernel = kernel
+
+    def runcode(self, code: Any) -> None:
+        self.kernel.run(code)
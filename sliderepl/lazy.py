@@ -0,0 +1,175 @@
+# sliderepl
+#   Copyright (c) Michael Bayer <mike_mp@zzzcomputing.com>
+#   sliderepl is released under the MIT License:
+#   http://www.opensource.org/licenses/mit-license.php
+"""Decks loaded a slide at a time, for very large generated decks.
+
+With ``--lazy``, loading a deck memory-maps each of its files and only
+looks for the ``### slide::`` and ``### file::`` lines in them, noting
+where each slide starts and ends.  A slide is parsed from its part of
+the file the first time it's needed, so the first slide comes up as
+quickly for a deck of thousands of slides as for one of ten.
+
+The deck cache isn't used for lazily loaded decks; the files are
+scanned again each time.
+
+"""
+from __future__ import annotations
+
+from collections.abc import Sequence
+import mmap
+import os
+import re
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+from typing import Tuple
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .core import Deck
+
+_marker_re = re.compile(rb"^### +(slide|file)::([^\r\n]*)", re.M)
+
+
+class _Entry(NamedTuple):
+    path: str
+    start: int
+    end: int
+    line: int
+
+
+def _map(path: str) -> Any:
+    with open(path, "rb") as fh:
+        try:
+            return mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # an empty file can't be mapped
+            return b""
+
+
+class Slides(Sequence):
+    """The slides of a deck, parsed as they're asked for."""
+
+    def __init__(self, deck: Deck, entries: List[_Entry], maps: Dict):
+        self.deck = deck
+        self._entries = entries
+        self._maps = maps
+        self._slides: Dict[int, Deck.Slide] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __getitem__(self, idx: Any) -> Any:
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError(idx)
+        slide = self._slides.get(idx)
+        if slide is None:
+            slide = _parse(self.deck, self._maps, self._entries[idx])
+            slide.index = idx + 1
+            self._slides[idx] = slide
+        return slide
+
+    def index(self, slide: Any, *args: Any) -> int:
+        # only a slide that has been parsed can be asked about
+        for idx, parsed in self._slides.items():
+            if parsed is slide:
+                return idx
+        raise ValueError(slide)
+
+
+def _parse(deck: Deck, maps: Dict, entry: _Entry) -> Deck.Slide:
+    text = maps[entry.path][entry.start : entry.end].decode()
+    return next(
+        type(deck)._parse_text(
+            entry.path,
+            deck,
+            text.replace("\r\n", "\n"),
+            follow_includes=False,
+            final=True,
+            first_line=entry.line,
+        )
+    )
+
+
+def _scan(
+    deck: Deck,
+    path: str,
+    maps: Dict,
+    entries: List[_Entry],
+    init: List[Tuple[_Entry, int]],
+) -> None:
+    """Add an entry for each slide in the file at path, and the files it
+    includes, in the order the slides would be parsed; setup slides go
+    in init, along with the index the parser would give them."""
+
+    deck.source_files.append(os.path.abspath(path))
+    mapped = maps[path] = _map(path)
+
+    # start, line and whether it's the setup slide, of the open slide
+    current: Optional[Tuple[int, int, bool]] = None
+    skip_to = 0
+    lines = counted = 0
+    for m in _marker_re.finditer(mapped):
+        if m.start() < skip_to:
+            continue
+        lines += mapped[counted : m.start()].count(b"\n")
+        counted = m.start()
+
+        if m.group(1) == b"file":
+            if not m.group(2).strip():
+                continue
+            _scan(
+                deck,
+                os.path.normpath(
+                    os.path.join(
+                        os.path.dirname(path), m.group(2).decode().strip()
+                    )
+                ),
+                maps,
+                entries,
+                init,
+            )
+            # the line following an include is suppressed, unless it's
+            # another include
+            following = mapped.find(b"\n", m.end()) + 1
+            if following:
+                include = _marker_re.match(mapped, following)
+                if include is None or include.group(1) != b"file":
+                    skip_to = mapped.find(b"\n", following) + 1 or len(mapped)
+            continue
+
+        if current is not None:
+            start, line, is_init = current
+            entry = _Entry(path, start, m.start(), line)
+            if is_init:
+                init.append((entry, len(entries) + 1))
+            else:
+                entries.append(entry)
+            current = None
+
+        opts = m.group(2)
+        if b"l" in opts and deck.short_pres:
+            continue
+        current = (m.start(), lines, b"s" in opts)
+
+
+def load(deck: Deck) -> None:
+    """Index the slides of ``deck`` for loading on demand."""
+
+    maps: Dict = {}
+    entries: List[_Entry] = []
+    init: List[Tuple[_Entry, int]] = []
+    _scan(deck, str(deck.path), maps, entries, init)
+
+    if init:
+        entry, index = init[-1]
+        deck.init_slide = _parse(deck, maps, entry)
+        deck.init_slide.index = index
+    deck.slides = Slides(deck, entries, maps)
@@ -3,14 +3,13 @@ import os
 from pathlib import Path
 import sys
 
-import tomli
-
-from . import Deck
-from . import menu
+from . import cache
 
 
 def _load_toml(config_file="pyproject.toml"):
     if os.path.exists(config_file):
+        import tomli
+
         with open(config_file, "rb") as f:
             toml_dict = tomli.load(f)  # type: ignore
     else:
@@ -33,12 +32,54 @@ def main(argv=None, **kwargs):
     parser.add_argument(
         "--run-all",
         action="store_true",
-        help="Execute all slides without prompting and exit.",
+        help="Execute all slides without prompting and exit.  With no "
+        "script, run every chapter deck headless and report on the result.",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=0,
+        help="Number of decks to run at once with --run-all "
+        "(default is the number of CPUs)",
+    )
+    parser.add_argument(
+        "--report",
+        type=str,
+        metavar="PATH",
+        help="Write a report of a --run-all of all chapters to PATH",
+    )
+    parser.add_argument(
+        "--report-format",
+        choices=("json", "junit"),
+        default="json",
+        help="Format of the --report file",
     )
     parser.add_argument(
         "-p", "--presentation", action="store_true", help="Presentation mode"
     )
-    parser.add_argument("--timer", action="store_true", help="Show timer")
+    parser.add_argument(
+        "--alt-screen",
+        action="store_true",
+        help="In presentation mode, show slides on the terminal's alternate "
+        "screen, restoring the original screen on exit",
+    )
+    parser.add_argument(
+        "--timer",
+        type=float,
+        nargs="?",
+        const=0,
+        metavar="MINUTES",
+        help="Show the time into the talk with each slide, and the time "
+        "left of MINUTES if given; log how long each slide took to render, "
+        "run and present to --timer-log",
+    )
+    parser.add_argument(
+        "--timer-log",
+        metavar="PATH",
+        help="JSON lines file --timer appends a record of each slide to "
+        "(default: <deck>.timer.jsonl)",
+    )
     parser.add_argument(
         "--toml-config",
         type=str,
@@ -60,6 +101,149 @@ def main(argv=None, **kwargs):
         help="Run the 'short' version of the slides "
         "(skip those with 'l' flag)",
     )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Don't read or write the compiled deck cache",
+    )
+    parser.add_argument(
+        "--clear-cache",
+        action="store_true",
+        help="Remove all compiled decks from the cache before starting",
+    )
+    parser.add_argument(
+        "--checkpoints",
+        choices=("fork", "pickle"),
+        help="Snapshot the console namespace after each slide, so that "
+        "going back to an earlier slide restores it instead of "
+        "replaying the deck",
+    )
+    parser.add_argument(
+        "--checkpoint-limit",
+        type=int,
+        default=16,
+        help="Maximum number of checkpoints to keep",
+    )
+    parser.add_argument(
+        "--checkpoint-memory",
+        type=int,
+        default=0,
+        help="Maximum memory in MB used by checkpoints (0 for no limit)",
+    )
+    parser.add_argument(
+        "--skipped-output",
+        choices=("capture", "show", "discard"),
+        default="capture",
+        help="What to do with output from the slides !goto and --run-all "
+        "run without displaying them; captured output is shown by the "
+        "!skipped command",
+    )
+    parser.add_argument(
+        "--lazy",
+        action="store_true",
+        help="Parse each slide when it's first needed, rather than the "
+        "whole deck on start up; for very large decks",
+    )
+    parser.add_argument(
+        "--validate",
+        action="store_true",
+        help="Check the code of every slide for syntax errors on start up, "
+        "rather than when each slide is first shown",
+    )
+    parser.add_argument(
+        "--minimal-replay",
+        action="store_true",
+        help="Have !goto run only the code of earlier slides that the "
+        "destination depends on; the rest runs when something needs it",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Reload the deck when it or a file it includes is edited, "
+        "running again the slides whose code changed; takes pickle "
+        "checkpoints unless --checkpoints is given",
+    )
+    parser.add_argument(
+        "--serve",
+        type=str,
+        metavar="[HOST:]PORT",
+        help="Serve what the presenter's terminal shows to followers "
+        "attaching with --follow",
+    )
+    parser.add_argument(
+        "--follow",
+        type=str,
+        metavar="[HOST:]PORT",
+        help="Follow along with a presenter running with --serve, rather "
+        "than running a deck",
+    )
+    parser.add_argument(
+        "--follow-next",
+        action="store_true",
+        help="With --follow, show the slide after the presenter's current "
+        "one",
+    )
+    parser.add_argument(
+        "--asyncio",
+        action="store_true",
+        help="Allow top-level await in slides and at the prompt, running "
+        "on one event loop for the whole session",
+    )
+    parser.add_argument(
+        "--kernel",
+        action="store_true",
+        help="Run slide code in a separate worker process, restarted from "
+        "a warm spare if it crashes",
+    )
+    parser.add_argument(
+        "--warm",
+        type=int,
+        default=0,
+        metavar="N",
+        help="Keep N chapters from the menu parsed and set up in the "
+        "background, ready to start right away",
+    )
+    parser.add_argument(
+        "--warm-policy",
+        choices=("next", "recent"),
+        default="next",
+        help="Which chapters --warm keeps ready: the ones following the "
+        "last chapter run, or the most recently run",
+    )
+    parser.add_argument(
+        "--prefetch",
+        type=int,
+        default=0,
+        metavar="N",
+        help="Render the next N slides in the background while the "
+        "current one is shown",
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="time",
+        choices=("time", "cprofile"),
+        help="Record the time taken by each codeblock, shown with the "
+        "!profile command; 'cprofile' also keeps a cProfile trace of each "
+        "slide",
+    )
+    parser.add_argument(
+        "--profile-dir",
+        type=str,
+        default=".",
+        metavar="DIR",
+        help="Directory !profile writes .pstats files to",
+    )
+    parser.add_argument(
+        "--mem",
+        nargs="?",
+        const="trace",
+        choices=("trace", "sample"),
+        help="Record how much memory each slide leaves allocated, shown with "
+        "the !mem command along with the largest objects and the lines "
+        "allocating most; 'sample' reads the process size instead of "
+        "tracing allocations, cheap enough for a live talk",
+    )
     parser.add_argument(
         "--color",
         dest="color",
@@ -73,6 +257,9 @@ def main(argv=None, **kwargs):
 
     options = parser.parse_args(argv)
 
+    if options.clear_cache:
+        cache.clear()
+
     toml = _load_toml(options.toml_config)
 
     slide_location = Path(".") / Path(toml.get("slides", "slides"))
@@ -84,10 +271,27 @@ def main(argv=None, **kwargs):
         locals_ = {}
         exec(config.read_text(), locals_)
         deck = locals_.get("deck")
+        # cached decks are laid out by the settings it gives the deck
+        options.config_file = str(config.absolute())
     if deck is None:
+        from . import Deck
+
         deck = Deck
 
-    if options.script is None:
+    if options.follow:
+        from . import broadcast
+
+        broadcast.follow(options.follow, options.follow_next)
+        return
+
+    if options.script is None and options.run_all:
+        from . import batch
+        from . import menu
+
+        sys.exit(batch.run_all(deck, options, menu.chapters(slide_location)))
+    elif options.script is None:
+        from . import menu
+
         menu.menu(deck, options, slide_location)
     else:
         deck.run(options.script, **vars(options))
@@ -0,0 +1,206 @@
+# sliderepl
+#   Copyright (c) Michael Bayer <mike_mp@zzzcomputing.com>
+#   sliderepl is released under the MIT License:
+#   http://www.opensource.org/licenses/mit-license.php
+"""Memoized output of slides marked with the ``m`` flag.
+
+The first time a ``### slide::m`` slide runs, whatever its codeblocks
+print is recorded along with the names they bind in the console
+namespace.  Later runs of the same code, from the same state, write the
+recorded output and restore the names instead of running anything.  This
+is for slides whose work is slow and deterministic, such as generating
+data or running EXPLAIN; changes a slide makes to objects it didn't bind
+itself aren't recorded.
+
+An entry is keyed on the code of the slide and every slide before it,
+on the names bound in the namespace when the slide is reached, and on
+the values of those the slide reads: pickled, or for modules and
+functions, their names and code.  A slide reading a value that can't be
+pickled, or using ``globals()`` and the like, isn't memoized.  Entries
+live in the cache directory; ``!forget`` removes those of the current
+deck.
+
+"""
+from __future__ import annotations
+
+import hashlib
+import marshal
+import os
+from pathlib import Path
+import pickle
+import sys
+import types
+from typing import Any
+from typing import Callable
+from typing import List
+from typing import MutableMapping
+from typing import Optional
+from typing import TYPE_CHECKING
+
+from . import cache
+from . import deps
+
+if TYPE_CHECKING:
+    from .core import Deck
+
+MEMO_VERSION = 1
+
+_missing = object()
+
+
+class _Tee:
+    """Passes writes on to a stream and records them."""
+
+    def __init__(self, stream: Any, record: List[str]):
+        self._stream = stream
+        self._record = record
+
+    def write(self, text: str) -> int:
+        self._record.append(text)
+        return self._stream.write(text)
+
+    def __getattr__(self, key: str) -> Any:
+        return getattr(self._stream, key)
+
+
+def _state(value: Any) -> bytes:
+    """Return bytes that change when ``value`` does, as far as a slide
+    reading it could tell."""
+
+    if isinstance(value, types.ModuleType):
+        return ("module:%s" % value.__name__).encode()
+    if isinstance(value, types.FunctionType):
+        # defined in the console, so not picklable by reference
+        return marshal.dumps(value.__code__) + pickle.dumps(
+            (value.__defaults__, value.__kwdefaults__)
+        )
+    if isinstance(value, type) and value.__module__ == "__console__":
+        return ("class:%s" % value.__qualname__).encode()
+    return pickle.dumps(value)
+
+
+class Memo:
+    """The memoized slides of one deck."""
+
+    def __init__(self, deck: Deck):
+        self.deck = deck
+        self.directory = (
+            cache.cache_dir()
+            / "memo"
+            / hashlib.sha1(os.path.abspath(deck.path).encode()).hexdigest()
+        )
+
+    def _entry_path(
+        self, num: int, slide: Deck.Slide, environ: MutableMapping[str, Any]
+    ) -> Optional[Path]:
+        """Return the path of the entry for slide ``num`` run from
+        ``environ``, or None if it can't be memoized."""
+
+        try:
+            names = deps.analyze(slide.source)
+        except SyntaxError:
+            return None
+        if names.opaque:
+            print(
+                "%% Slide %d isn't memoized: it reads the namespace "
+                "as a whole" % num
+            )
+            return None
+        hash_ = hashlib.sha1(str(MEMO_VERSION).encode())
+        hash_.update(self.deck._fingerprint(num))
+        hash_.update("\0".join(sorted(environ)).encode())
+        for name in sorted(names.reads):
+            if name not in environ:
+                continue
+            try:
+                state = _state(environ[name])
+            except Exception as err:
+                print("%% Slide %d isn't memoized: %s: %s" % (num, name, err))
+                return None
+            hash_.update(hashlib.sha1(state).digest())
+        return self.directory / (hash_.hexdigest() + ".pickle")
+
+    def _load(self, path: Path) -> Optional[dict]:
+        try:
+            with open(path, "rb") as fh:
+                entry = pickle.load(fh)
+            entry["bindings"] = pickle.loads(entry["bindings"])
+        except Exception:
+            return None
+        return entry
+
+    def run(
+        self,
+        slide: Deck.Slide,
+        environ: MutableMapping[str, Any],
+        show: Optional[Callable[[int], None]] = None,
+    ) -> bool:
+        """Run the codeblocks of ``slide``, or replay them if they've
+        been run before; ``show`` is called with the index of each
+        codeblock before it runs.  Returns False if a codeblock raised.
+
+        """
+        num = self.deck.slides.index(slide) + 1
+        path = self._entry_path(num, slide, environ)
+        entry = self._load(path) if path is not None else None
+        if entry is not None:
+            for idx, output in enumerate(entry["outputs"]):
+                if show is not None:
+                    show(idx)
+                sys.stdout.write(output)
+            for name in entry["deleted"]:
+                environ.pop(name, None)
+            environ.update(entry["bindings"])
+            return True
+
+        before = dict(environ)
+        outputs = []
+        ok = True
+        for idx, co in enumerate(slide.code):
+            if show is not None:
+                show(idx)
+            record: List[str] = []
+            stdout, stderr = sys.stdout, sys.stderr
+            sys.stdout, sys.stderr = _Tee(stdout, record), _Tee(stderr, record)
+            try:
+                ok = self.deck._exec(co, slide, idx) and ok
+            finally:
+                sys.stdout, sys.stderr = stdout, stderr
+            outputs.append("".join(record))
+        if not ok:
+            return False
+        if path is None:
+            return True
+
+        bindings = {
+            name: value
+            for name, value in environ.items()
+            if before.get(name, _missing) is not value
+        }
+        try:
+            data = pickle.dumps(bindings)
+        except Exception as err:
+            print("%% Slide %d isn't memoized: %s" % (num, err))
+            return True
+        cache.write(
+            path,
+            {
+                "outputs": outputs,
+                "bindings": data,
+                "deleted": [name for name in before if name not in environ],
+            },
+        )
+        return True
+
+    def forget(self) -> int:
+        """Remove the deck's memoized slides; returns how many there
+        were."""
+
+        count = 0
+        for path in self.directory.glob("*.pickle"):
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            count += 1
+        return count
@@ -0,0 +1,282 @@
+# sliderepl
+#   Copyright (c) Michael Bayer <mike_mp@zzzcomputing.com>
+#   sliderepl is released under the MIT License:
+#   http://www.opensource.org/licenses/mit-license.php
+"""Memory use of the console namespace, for finding the slides of a long
+workshop that make it grow.
+
+Enabled with ``--mem``, which traces allocations with
+:mod:`tracemalloc`.  The memory traced is noted before and after each
+codeblock runs, and the ``!mem`` command shows:
+
+* the slides whose codeblocks left the most memory allocated, and the
+  most they had allocated at once while running
+* the largest objects in the console namespace, by the size of
+  everything reachable from them
+* the lines of the deck's files that allocated the most memory still
+  allocated now, from a snapshot taken when ``!mem`` is run
+
+So that allocations are traced back to lines of the deck's files,
+codeblocks are compiled with their file name and line numbers in it,
+which tracebacks then show as well.
+
+Tracing slows down allocation considerably.  ``--mem sample`` traces
+nothing and instead reads the size of the process from the OS before
+and after each codeblock, which costs some tens of microseconds; it's
+cheap enough to leave on during a talk, but can't show allocating
+lines.
+
+"""
+from __future__ import annotations
+
+import ast
+from contextlib import contextmanager
+import gc
+import glob
+import linecache
+import os
+import sys
+import tracemalloc
+import types
+from typing import Any
+from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import MutableMapping
+from typing import Sequence
+from typing import Tuple
+
+from .profiling import describe
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# objects shared by everything, not counted in the size of what refers
+# to them
+_SHARED = (
+    type,
+    types.ModuleType,
+    types.FunctionType,
+    types.BuiltinFunctionType,
+    types.CodeType,
+    types.FrameType,
+)
+
+# Python 3.9 and later; without it, the peak of each codeblock isn't
+# known
+_reset_peak = getattr(tracemalloc, "reset_peak", None)
+
+try:
+    _PAGE = os.sysconf("SC_PAGE_SIZE")
+except (AttributeError, ValueError, OSError):
+    _PAGE = 4096
+
+
+def _rss() -> int:
+    """Return the resident size of the process in bytes, or its peak size
+    where the current one isn't available."""
+
+    try:
+        with open("/proc/self/statm", "rb") as fh:
+            return int(fh.read().split()[1]) * _PAGE
+    except (OSError, ValueError, IndexError):
+        pass
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def deep_size(
+    obj: Any, exclude: Sequence[Any] = (), limit: int = 1000000
+) -> int:
+    """Return the size of ``obj`` and everything reachable from it,
+    stopping at modules, classes, functions and the objects in
+    ``exclude``, or after ``limit`` objects."""
+
+    seen = {id(item) for item in exclude}
+    size = 0
+    stack = [obj]
+    while stack and len(seen) < limit:
+        item = stack.pop()
+        if id(item) in seen or isinstance(item, _SHARED):
+            continue
+        seen.add(id(item))
+        size += sys.getsizeof(item)
+        stack.extend(gc.get_referents(item))
+    return size
+
+
+def _kib(size: int) -> str:
+    return "%.1f" % (size / 1024)
+
+
+class Growth:
+    """Accumulated memory growth of one slide."""
+
+    __slots__ = ("calls", "grown", "peak")
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.grown = 0
+        self.peak = 0
+
+
+class Memory:
+    def __init__(self, deck: Any, mode: str = "trace"):
+        self.deck = deck
+        self.mode = mode
+        self.traced = mode == "trace"
+        self.peaks = self.traced and _reset_peak is not None
+        self._growth: Dict[int, Growth] = {}
+        if self.traced and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def _number(self, slide: Any) -> int:
+        return 0 if slide is self.deck.init_slide else slide.index
+
+    def _size(self) -> int:
+        if self.traced:
+            return tracemalloc.get_traced_memory()[0]
+        return _rss()
+
+    @contextmanager
+    def measure(self, slide: Any, index: int) -> Iterator[None]:
+        """Note the memory the codeblock ``index`` of ``slide`` run within
+        the block leaves allocated."""
+
+        num = self._number(slide)
+        growth = self._growth.get(num)
+        if growth is None:
+            growth = self._growth[num] = Growth()
+        if self.peaks:
+            _reset_peak()
+        before = self._size()
+        try:
+            yield
+        finally:
+            after = self._size()
+            growth.grown += after - before
+            if self.peaks:
+                peak = tracemalloc.get_traced_memory()[1] - before
+                growth.peak = max(growth.peak, peak)
+            growth.calls += 1
+
+    def compile(
+        self,
+        slide: Any,
+        first: int,
+        display: Sequence[str],
+        mode: str,
+        flags: int,
+    ) -> types.CodeType:
+        """Compile a codeblock starting at line ``first`` of ``slide``'s
+        code, with the file name and line numbers of the deck file."""
+
+        tree = ast.parse("".join(display), slide.file, mode)
+        start = slide._line_number(first + 1)
+        if (
+            slide._line_number(first + len(display)) - start
+            == len(display) - 1
+        ):
+            # the codeblock's lines are together in the file
+            ast.increment_lineno(tree, start - 1)
+            return compile(tree, slide.file, mode, flags)
+
+        lines = [
+            slide._line_number(first + lineno)
+            for lineno in range(1, len(display) + 1)
+        ]
+        for node in ast.walk(tree):
+            if getattr(node, "lineno", None):
+                node.lineno = lines[node.lineno - 1]
+            if getattr(node, "end_lineno", None):
+                node.end_lineno = lines[node.end_lineno - 1]
+        return compile(tree, slide.file, mode, flags)
+
+    def report(
+        self, namespace: MutableMapping[str, Any], limit: int = 10
+    ) -> None:
+        """Print the slides that grew memory the most, the largest objects
+        in ``namespace``, and the lines that allocated the most."""
+
+        if self.traced:
+            print(
+                "%% %s KiB traced now, %s KiB at most"
+                % tuple(_kib(size) for size in tracemalloc.get_traced_memory())
+            )
+        else:
+            print("%% %s KiB resident now" % _kib(_rss()))
+
+        if not self._growth:
+            print("% nothing has been run yet")
+        else:
+            print(
+                "%% %11s %9s %6s  %s"
+                % ("grew KiB", "peak KiB", "runs", "slides that grew most")
+            )
+            for num, growth in sorted(
+                self._growth.items(), key=lambda item: -item[1].grown
+            )[:limit]:
+                print(
+                    "%% %11s %9s %6d  %s"
+                    % (
+                        _kib(growth.grown),
+                        _kib(growth.peak) if self.peaks else "-",
+                        growth.calls,
+                        describe(self.deck, num),
+                    )
+                )
+
+        largest = self._largest(namespace, limit)
+        if largest:
+            print("%% %11s  %s" % ("KiB", "largest objects"))
+            for name, size, kind in largest:
+                print("%% %11s  %s (%s)" % (_kib(size), name, kind))
+
+        if not self.traced:
+            print("% allocating lines need --mem trace")
+            return
+        lines = self._lines(limit)
+        if lines:
+            print("%% %11s %9s  %s" % ("KiB", "blocks", "allocating lines"))
+            for stat in lines:
+                frame = stat.traceback[0]
+                print(
+                    "%% %11s %9d  %s:%d: %s"
+                    % (
+                        _kib(stat.size),
+                        stat.count,
+                        os.path.relpath(frame.filename),
+                        frame.lineno,
+                        _source_line(frame.filename, frame.lineno),
+                    )
+                )
+
+    def _largest(
+        self, namespace: MutableMapping[str, Any], limit: int
+    ) -> List[Tuple[str, int, str]]:
+        sizes = []
+        for name, value in list(namespace.items()):
+            if name.startswith("__") or isinstance(value, _SHARED):
+                continue
+            sizes.append(
+                (name, deep_size(value, (namespace,)), type(value).__name__)
+            )
+        sizes.sort(key=lambda item: -item[1])
+        return sizes[:limit]
+
+    def _lines(self, limit: int) -> List[tracemalloc.Statistic]:
+        files = {self.deck.init_slide.file} if self.deck.init_slide else set()
+        files.update(slide.file for slide in self.deck.slides)
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(True, glob.escape(path)) for path in files]
+        )
+        return snapshot.statistics("lineno")[:limit]
+
+
+def _source_line(path: str, lineno: int) -> str:
+    return linecache.getline(path, lineno).strip()[:50]
@@ -1,23 +1,40 @@
+from __future__ import annotations
+
 from argparse import Namespace
+import io
+import os
 from pathlib import Path
 import re
+import signal
 import sys
-
-from termcolor import colored as color_text
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
 
 from . import Deck
+from . import forking
+from . import index
+
+
+def _color_text(text, color):
+    from termcolor import colored
+
+    return colored(text, color)
 
 
 def _prompt_text(text):
-    return color_text(text, "green")
+    return _color_text(text, "green")
 
 
 def _number_text(text):
-    return color_text(text, "magenta")
+    return _color_text(text, "magenta")
 
 
 def _header_text(text):
-    return color_text(text, "cyan")
+    return _color_text(text, "cyan")
 
 
 class DeckFile:
@@ -29,26 +46,167 @@ class DeckFile:
         return self.name
 
 
+def chapters(slides: Path) -> List[Path]:
+    """Return the numbered chapter decks in the slides directory."""
+
+    return sorted(
+        [
+            path
+            for path in slides.glob("[!_]*.py")
+            if re.match(r"^\d+_", path.name)
+        ]
+    )
+
+
+class WarmDecks:
+    """A small pool of forked processes, each with a chapter already
+    parsed and its setup slide run, waiting to take over the terminal.
+
+    ``policy`` picks which chapters to keep warm: ``"next"`` keeps the
+    chapters following the one last run, ``"recent"`` the ones run most
+    recently.
+
+    """
+
+    def __init__(self, deck: Deck, options: Namespace, size: int, policy: str):
+        self.deck = deck
+        self.options = options
+        self.size = size
+        self.policy = policy
+        self._warm: Dict[Path, Tuple[Any, float]] = {}
+        self._recent: List[Path] = []
+
+    def _prepare(self, path: Path, wait: Callable[[], Any]) -> None:
+        # keep quiet and ignore Ctrl-C at the menu until we're chosen
+        output = io.StringIO()
+        sys.stdout = sys.stderr = output
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+        def ready() -> None:
+            wait()
+            signal.signal(signal.SIGINT, signal.default_int_handler)
+            sys.stdout, sys.stderr = sys.__stdout__, sys.__stderr__
+            sys.stdout.write(output.getvalue())
+
+        self.deck.run(path, ready=ready, **vars(self.options))
+
+    def _predict(self, all_slides: List[DeckFile]) -> List[Path]:
+        paths = [deck_file.path for deck_file in all_slides]
+        if self.policy == "recent":
+            predicted = self._recent[-self.size :]
+            if not predicted:
+                predicted = paths[: self.size]
+        else:
+            start = (
+                paths.index(self._recent[-1]) + 1
+                if self._recent and self._recent[-1] in paths
+                else 0
+            )
+            predicted = paths[start : start + self.size]
+        return predicted
+
+    def refill(self, all_slides: List[DeckFile]) -> None:
+        """Discard warm chapters that are no longer wanted or whose file
+        has changed, and start the ones that are missing."""
+
+        predicted = self._predict(all_slides)
+        for path, (paused, mtime) in list(self._warm.items()):
+            if path not in predicted or _mtime(path) != mtime:
+                paused.discard()
+                del self._warm[path]
+        for path in predicted:
+            if path not in self._warm:
+                self._warm[path] = (
+                    forking.fork_running(
+                        lambda wait, path=path: self._prepare(path, wait)
+                    ),
+                    _mtime(path),
+                )
+
+    def run(self, path: Path, slide: Optional[int] = None) -> None:
+        """Run a chapter, handing over to its warm process if there is
+        one."""
+
+        if path in self._recent:
+            self._recent.remove(path)
+        self._recent.append(path)
+
+        if slide is not None:
+            self.deck.run(path, slide=slide, **vars(self.options))
+            return
+
+        entry = self._warm.pop(path, None)
+        if entry is not None and _mtime(path) == entry[1]:
+            try:
+                entry[0].resume({})
+            except OSError:
+                pass
+            else:
+                return
+        elif entry is not None:
+            entry[0].discard()
+        self.deck.run(path, **vars(self.options))
+
+    def close(self) -> None:
+        for paused, _ in self._warm.values():
+            paused.discard()
+        self._warm.clear()
+
+
+def _mtime(path: Path) -> float:
+    try:
+        return path.stat().st_mtime
+    except OSError:
+        return 0
+
+
 def menu(deck: Deck, options: Namespace, slides: Path) -> None:
-    all_slides = [
-        DeckFile(p)
-        for p in sorted(
-            [
-                path
-                for path in slides.glob("[!_]*.py")
-                if re.match(r"^\d+_", path.name)
-            ]
-        )
-    ]
+    all_slides = [DeckFile(p) for p in chapters(slides)]
+
+    idx = index.Index(
+        deck,
+        short=getattr(options, "short", False),
+        no_cache=getattr(options, "no_cache", False),
+    )
+
+    warm = None
+    if getattr(options, "warm", 0) and hasattr(os, "fork"):
+        warm = WarmDecks(deck, options, options.warm, options.warm_policy)
+    try:
+        _menu(deck, options, all_slides, idx, warm)
+    finally:
+        if warm is not None:
+            warm.close()
+
+
+def _menu(
+    deck: Deck,
+    options: Namespace,
+    all_slides: List[DeckFile],
+    idx: index.Index,
+    warm: Optional[WarmDecks],
+) -> None:
+    idx.refresh([deck_file.path for deck_file in all_slides])
+    width = max([len(str(deck_file)) for deck_file in all_slides] + [0])
 
     while True:
         print("\n\n")
         print(_header_text("Slide Deck"))
         print(_header_text("=========="))
-        for idx, filename in enumerate(all_slides, 1):
-            print(_number_text(f"[{idx}]"), filename)
-            idx += 1
+        for num, deck_file in enumerate(all_slides, 1):
+            info = idx.decks.get(str(deck_file.path))
+            if info is not None:
+                print(
+                    _number_text(f"[{num}]"),
+                    f"{str(deck_file):{width}}  {len(info.slides):3} slides  "
+                    f"{info.title}",
+                )
+            else:
+                print(_number_text(f"[{num}]"), deck_file)
+        print(_number_text("[/text]"), "Search")
         print(_number_text("[Q]"), "Quit")
+        if warm is not None:
+            warm.refill(all_slides)
         prompt = "\n" + _prompt_text("[enter chapter number]: ")
         try:
             line = input(prompt)
@@ -56,13 +214,44 @@ def menu(deck: Deck, options: Namespace, slides: Path) -> None:
             break
 
         cmd = line.strip().lower()
+        chapter = re.match(r"^(\d+)(?:\.(\d+))?$", cmd)
         if cmd == "q":
             sys.exit()
-        elif re.match(r"^\d+$", cmd):
-            num = int(cmd)
+        elif cmd.startswith("/"):
+            _search(idx, all_slides, cmd[1:].strip())
+            continue
+        elif chapter:
+            num = int(chapter.group(1))
+            slide = int(chapter.group(2)) if chapter.group(2) else None
             if num < 1 or num > len(all_slides):
                 print("Invalid slide number")
+            elif warm is not None:
+                warm.run(all_slides[num - 1].path, slide)
             else:
-                deck.run(all_slides[num - 1].path, **vars(options))
+                deck.run(
+                    all_slides[num - 1].path, slide=slide, **vars(options)
+                )
         else:
             print("unknown command")
+        idx.refresh([deck_file.path for deck_file in all_slides])
+
+
+def _search(idx: index.Index, all_slides: List[DeckFile], term: str) -> None:
+    if not term:
+        print("Usage: /text")
+        return
+    numbers = {
+        str(deck_file.path): num for num, deck_file in enumerate(all_slides, 1)
+    }
+    matches = idx.search(term)
+    if not matches:
+        print(f"No slides found for {term!r}")
+        return
+    print()
+    for match in matches:
+        print(
+            _number_text(f"[{numbers[match.path]}.{match.slide}]"),
+            f"{Path(match.path).name}, slide {match.slide}: "
+            f"{match.title} ({match.field})",
+        )
+    print("\nEnter [chapter.slide] to go straight to a slide")
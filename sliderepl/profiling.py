@@ -0,0 +1,156 @@
+# sliderepl
+#   Copyright (c) Michael Bayer <mike_mp@zzzcomputing.com>
+#   sliderepl is released under the MIT License:
+#   http://www.opensource.org/licenses/mit-license.php
+"""Timing of executed codeblocks, for finding the slow parts of a deck.
+
+Enabled with ``--profile``; ``--profile cprofile`` additionally keeps a
+``cProfile`` trace for each slide.  When profiling isn't enabled the deck
+doesn't create a :class:`.Profiler` at all.
+
+"""
+from __future__ import annotations
+
+from contextlib import contextmanager
+import cProfile
+import os
+import time
+from typing import Any
+from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import Tuple
+
+
+class Timing:
+    """Accumulated timings of one codeblock."""
+
+    __slots__ = ("calls", "wall", "cpu")
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+
+
+class Profiler:
+    def __init__(self, deck: Any, mode: str = "time", directory: str = "."):
+        self.deck = deck
+        self.mode = mode
+        self.directory = directory
+        self._timings: Dict[Tuple[int, int], Timing] = {}
+        self._profiles: Dict[int, cProfile.Profile] = {}
+
+    def _number(self, slide: Any) -> int:
+        return 0 if slide is self.deck.init_slide else slide.index
+
+    @contextmanager
+    def measure(self, slide: Any, index: int) -> Iterator[None]:
+        """Time the codeblock ``index`` of ``slide`` run within the
+        block."""
+
+        num = self._number(slide)
+        timing = self._timings.get((num, index))
+        if timing is None:
+            timing = self._timings[(num, index)] = Timing()
+
+        profile = None
+        if self.mode == "cprofile":
+            profile = self._profiles.get(num)
+            if profile is None:
+                profile = self._profiles[num] = cProfile.Profile()
+            profile.enable()
+
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield
+        finally:
+            timing.wall += time.perf_counter() - wall
+            timing.cpu += time.process_time() - cpu
+            timing.calls += 1
+            if profile is not None:
+                profile.disable()
+
+    def _slide(self, num: int) -> Any:
+        return self.deck.init_slide if num == 0 else self.deck.slides[num - 1]
+
+    def _describe(self, num: int) -> str:
+        return describe(self.deck, num)
+
+    def report(self, limit: int = 10) -> None:
+        """Print the slowest slides and codeblocks, and write out any
+        ``cProfile`` traces."""
+
+        if not self._timings:
+            print("% nothing has been run yet")
+            return
+
+        slides: Dict[int, Timing] = {}
+        for (num, _), timing in self._timings.items():
+            total = slides.get(num)
+            if total is None:
+                total = slides[num] = Timing()
+            total.wall += timing.wall
+            total.cpu += timing.cpu
+            total.calls = max(total.calls, timing.calls)
+
+        print(
+            "%% %11s %9s %6s  %s"
+            % ("wall s", "cpu s", "runs", "slowest slides")
+        )
+        for num, timing in _slowest(slides.items(), limit):
+            print(
+                "%% %11.4f %9.4f %6d  %s"
+                % (timing.wall, timing.cpu, timing.calls, self._describe(num))
+            )
+
+        print(
+            "%% %11s %9s %6s  %s"
+            % ("wall s", "cpu s", "runs", "slowest codeblocks")
+        )
+        for (num, index), timing in _slowest(self._timings.items(), limit):
+            display = self._slide(num).displays[index]
+            first = next((line for line in display if line.strip()), "")
+            print(
+                "%% %11.4f %9.4f %6d  %s, block %d: %s"
+                % (
+                    timing.wall,
+                    timing.cpu,
+                    timing.calls,
+                    self._describe(num),
+                    index + 1,
+                    first.strip()[:40],
+                )
+            )
+
+        if self._profiles:
+            os.makedirs(self.directory, exist_ok=True)
+            stem = os.path.splitext(os.path.basename(str(self.deck.path)))[0]
+            for num, profile in sorted(self._profiles.items()):
+                profile.dump_stats(
+                    os.path.join(
+                        self.directory, "%s-slide%03d.pstats" % (stem, num)
+                    )
+                )
+            print(
+                "%% wrote %d .pstats files to %s"
+                % (len(self._profiles), self.directory)
+            )
+
+
+def describe(deck: Any, num: int) -> str:
+    """Return a description of slide ``num``, 0 being the setup slide."""
+
+    if num == 0:
+        return "setup slide"
+    slide = deck.slides[num - 1]
+    title = slide.title or next((line for line in slide.intro if line), "")
+    if title:
+        return "slide %d: %s" % (num, title)
+    else:
+        return "slide %d" % num
+
+
+def _slowest(items: Any, limit: int) -> List[Any]:
+    return sorted(items, key=lambda item: item[1].wall, reverse=True)[:limit]
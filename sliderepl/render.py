@@ -0,0 +1,157 @@
+# sliderepl
+#   Copyright (c) Michael Bayer <mike_mp@zzzcomputing.com>
+#   sliderepl is released under the MIT License:
+#   http://www.opensource.org/licenses/mit-license.php
+"""Slides rendered ahead of time for display."""
+from __future__ import annotations
+
+import os
+import re
+import textwrap
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+from typing import Tuple
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import queue
+
+_directive_re = re.compile(r"\!\!\{(.+?)}")
+
+
+class Markup(NamedTuple):
+    """Text with its ``!!{style}`` directives resolved into styled spans.
+
+    A span styled ``None`` takes on the style of wherever the text is
+    rendered.  ``width`` is the number of visible characters.
+
+    """
+
+    spans: Tuple[Tuple[Optional[str], str], ...]
+    width: int
+
+
+def parse_markup(text: str) -> Markup:
+    spans = []
+    style = None
+    for idx, token in enumerate(_directive_re.split(text)):
+        if idx % 2:
+            style = None if token == "reset" else token
+        elif token:
+            spans.append((style, token))
+    return Markup(tuple(spans), sum(len(token) for _, token in spans))
+
+
+def compile_bullet(bullet: str, width: int) -> Markup:
+    """Wrap a ``###   * bullet`` line and resolve its ``**bold**`` and
+    ````code```` markers, along with any ``!!{style}`` directives."""
+
+    indent = re.match(r"^ +\* ", bullet)
+    assert indent is not None
+    padding = len(indent.group(0)) * " "
+
+    bullet = "\n".join(
+        [
+            padding + line if lineno > 0 else line
+            for lineno, line in enumerate(textwrap.wrap(bullet, width=width))
+        ]
+    )
+
+    bullet_tokens = re.match(r"^( +)\* (.*)", bullet, re.S)
+
+    assert bullet_tokens
+
+    spans = [("boldbullet", f"{bullet_tokens.group(1)}\u2022 ")]
+
+    color = "plain"
+    for element in re.split(r"(\*\*|``)", bullet_tokens.group(2)):
+        if element == "**":
+            color = "boldbullet" if color != "boldbullet" else "plain"
+        elif element == "``":
+            color = "codebullet" if color != "codebullet" else "plain"
+        else:
+            spans.extend(
+                (style or color, token)
+                for style, token in parse_markup(element).spans
+            )
+    return Markup(tuple(spans), sum(len(token) for _, token in spans))
+
+
+class Frame:
+    """The rendered text of a slide: the banner, each bullet, and each
+    codeblock, ready to be written out as is.
+
+    ``state`` records the deck settings the frame was rendered under;
+    a frame is stale once those change.
+
+    """
+
+    def __init__(self, deck: Any, slide: Any):
+        self.slide = slide
+        self.state = deck._render_state()
+        self.head: str = deck._render_head(slide)
+        self.bullets: List[Tuple[str, bool]] = deck._render_bullets(slide)
+        self._blocks: Dict[bool, List[str]] = {}
+        self.blocks(not slide.no_exec)
+
+    def blocks(self, run: bool) -> List[str]:
+        """Return the text of each codeblock, as displayed when the slide
+        is run or only shown."""
+
+        if run not in self._blocks:
+            self._blocks[run] = self.slide._render_blocks(run)
+        return self._blocks[run]
+
+
+class Prefetcher:
+    """Renders the next few slides on a background thread while the
+    current one is on screen."""
+
+    def __init__(self, deck: Any, count: int):
+        self.deck = deck
+        self.count = count
+        self._pid = None
+
+    def _start(self) -> None:
+        import queue
+        import threading
+
+        # a forked checkpoint inherits our state but not our thread
+        self._pid = os.getpid()
+        self._queue: queue.Queue[Any] = queue.Queue()
+        threading.Thread(
+            target=self._work, args=(self._queue,), daemon=True
+        ).start()
+
+    def after(self, num: int) -> None:
+        """Queue up the slides following slide ``num``.
+
+        Slides are parsed and split into codeblocks here, on the main
+        thread; one whose code doesn't parse is left for the error to be
+        reported when it's shown.
+
+        """
+        if self._pid != os.getpid():
+            self._start()
+        slides = self.deck.slides
+        for upcoming in range(num + 1, min(num + self.count, len(slides)) + 1):
+            slide = slides[upcoming - 1]
+            if slide._blocks is None:
+                try:
+                    slide._blocks = slide._find_blocks()
+                except SyntaxError:
+                    continue
+            self._queue.put(slide)
+
+    def _work(self, requests: queue.Queue[Any]) -> None:
+        while True:
+            slide = requests.get()
+            try:
+                self.deck._frame(slide)
+            except Exception:
+                # rendered again, with the error reported, when the
+                # slide is actually shown
+                pass
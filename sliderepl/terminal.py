@@ -0,0 +1,105 @@
+# sliderepl
+#   Copyright (c) Michael Bayer <mike_mp@zzzcomputing.com>
+#   sliderepl is released under the MIT License:
+#   http://www.opensource.org/licenses/mit-license.php
+"""Writing slides out to the terminal.
+
+In presentation mode the screen is cleared before each slide.  On a
+terminal that understands ANSI escapes, that's done with an escape
+sequence written out along with the slide, so that clearing and drawing
+happen in one write with no flicker in between.  On Windows the ``cls``
+command is still used, and on a dumb terminal, or when output isn't a
+terminal at all, slides are separated by a blank line instead.
+
+"""
+from __future__ import annotations
+
+import os
+import sys
+
+# cursor home, clear the screen, clear the scrollback
+CLEAR = "\x1b[H\x1b[2J\x1b[3J"
+ENTER_ALT_SCREEN = "\x1b[?1049h"
+LEAVE_ALT_SCREEN = "\x1b[?1049l"
+
+# whether the alternate screen is in use; it belongs to the terminal,
+# not to any one deck
+_alt_screen = False
+
+
+def _mode() -> str:
+    if sys.platform == "win32":
+        return "command"
+    isatty = getattr(sys.stdout, "isatty", None)
+    if not (isatty and isatty()):
+        return "plain"
+    if os.environ.get("TERM", "dumb") == "dumb":
+        return "plain"
+    return "ansi"
+
+
+class Screen:
+    """Writes out frames of text, each in a single write.
+
+    Text passed to :meth:`queue` is held back and written out ahead of
+    whatever is passed to :meth:`write` next.  With ``alt_screen``, an
+    ANSI terminal's alternate screen is used once the first slide is
+    cleared, and :func:`leave` restores the screen and scrollback as
+    they were before the deck started.
+
+    """
+
+    def __init__(self, alt_screen: bool = False):
+        self.alt_screen = alt_screen
+        self._queued = []
+
+    @property
+    def mode(self) -> str:
+        # looked up each time rather than once; a deck may be made while
+        # stdout is redirected, as the menu's warm decks are, and shown
+        # once it isn't
+        return _mode()
+
+    def clear(self) -> None:
+        mode = self.mode
+        if mode == "ansi":
+            self._queued.append(CLEAR)
+        elif mode == "command":
+            self.write("")
+            os.system("cls")
+        else:
+            self._queued.append("\n")
+
+    def queue(self, text: str) -> None:
+        self._queued.append(text)
+
+    def take(self) -> str:
+        """Return, and stop holding, the queued text."""
+
+        text = "".join(self._queued)
+        self._queued = []
+        return text
+
+    def write(self, text: str) -> None:
+        text = self.take() + text
+        if text:
+            sys.stdout.write(text)
+            sys.stdout.flush()
+
+    def enter(self) -> None:
+        """Switch to the alternate screen, along with the next write."""
+
+        global _alt_screen
+        if self.alt_screen and not _alt_screen and self.mode == "ansi":
+            _alt_screen = True
+            self.queue(ENTER_ALT_SCREEN)
+
+
+def leave() -> None:
+    """Switch back from the alternate screen, if it's in use."""
+
+    global _alt_screen
+    if _alt_screen:
+        _alt_screen = False
+        sys.stdout.write(LEAVE_ALT_SCREEN)
+        sys.stdout.flush()
@@ -0,0 +1,152 @@
+# sliderepl
+#   Copyright (c) Michael Bayer <mike_mp@zzzcomputing.com>
+#   sliderepl is released under the MIT License:
+#   http://www.opensource.org/licenses/mit-license.php
+"""Timing of a talk, for rehearsals.
+
+With ``--timer``, each slide is shown with the time since the first
+slide came up, and with ``--timer MINUTES``, the time left as well.  For
+every slide shown, a line of JSON is appended to the ``--timer-log``
+file once the presenter moves on, recording:
+
+* ``render``: seconds taken to render the slide's banner, bullets and
+  highlighted code; near zero if it was prefetched
+* ``exec``: seconds taken by each codeblock run while it was up
+* ``dwell``: seconds it was on screen
+* ``at``: seconds into the talk it came up
+
+Slides run without being shown, as by ``!goto``, get a record with
+``shown`` false and their ``exec`` timings.  Each run of the deck is
+told apart by its ``session``, the time it started.
+
+"""
+from __future__ import annotations
+
+from contextlib import contextmanager
+import json
+import time
+from typing import Any
+from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import Optional
+
+
+def _clock(seconds: float) -> str:
+    minutes, seconds = divmod(int(abs(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return "%d:%02d:%02d" % (hours, minutes, seconds)
+    return "%02d:%02d" % (minutes, seconds)
+
+
+class Timer:
+    def __init__(self, minutes: float = 0, path: Optional[str] = None):
+        self.minutes = minutes
+        self.path = path
+        self.session = time.time()
+        self._start: Optional[float] = None
+        self._log: Any = None
+        # the record of the slide on screen, and when it came up
+        self._current: Optional[Dict[str, Any]] = None
+        self._shown_at = 0.0
+        # codeblock timings not yet written, keyed on slide number
+        self._exec: Dict[int, List[float]] = {}
+
+    def elapsed(self) -> float:
+        if self._start is None:
+            return 0.0
+        return time.monotonic() - self._start
+
+    def status(self) -> str:
+        """Return the time into the talk, and the time left."""
+
+        elapsed = self.elapsed()
+        text = "%s elapsed" % _clock(elapsed)
+        if self.minutes:
+            left = self.minutes * 60 - elapsed
+            if left >= 0:
+                text += ", %s left" % _clock(left)
+            else:
+                text += ", %s over" % _clock(left)
+        return text
+
+    @contextmanager
+    def measure(self, num: int, index: int) -> Iterator[None]:
+        """Time codeblock ``index`` of slide ``num`` run within the
+        block."""
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            blocks = self._exec.setdefault(num, [])
+            blocks.extend([0.0] * (index + 1 - len(blocks)))
+            blocks[index] += time.perf_counter() - start
+
+    def shown(self, deck: Any, num: int, render: float) -> None:
+        """Note that slide ``num`` has come up, having taken ``render``
+        seconds to render."""
+
+        now = time.monotonic()
+        if self._start is None:
+            self._start = now
+        self._finish(now)
+        slide = deck.slides[num - 1]
+        self._current = {
+            "session": self.session,
+            "deck": str(deck.path),
+            "slide": num,
+            "title": slide.title,
+            "shown": True,
+            "at": round(now - self._start, 3),
+            "render": round(render, 6),
+        }
+        self._shown_at = now
+
+    def flush(self) -> None:
+        """Write out the record of the slide on screen, as if the
+        presenter had moved on from it."""
+
+        self._finish(time.monotonic())
+
+    def discard(self) -> None:
+        """Forget the slide on screen, and codeblock timings not yet
+        written; as they were when a checkpoint was taken, they've been
+        written already."""
+
+        self._current = None
+        self._exec.clear()
+
+    def _finish(self, now: float) -> None:
+        current, self._current = self._current, None
+        if current is not None:
+            current["exec"] = self._exec.pop(current["slide"], [])
+            current["dwell"] = round(now - self._shown_at, 3)
+            self._write(current)
+        for num in sorted(self._exec):
+            self._write(
+                {
+                    "session": self.session,
+                    "slide": num,
+                    "shown": False,
+                    "exec": self._exec[num],
+                }
+            )
+        self._exec.clear()
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        if self.path is None:
+            return
+        if "exec" in record:
+            record["exec"] = [round(t, 6) for t in record["exec"]]
+        if self._log is None:
+            self._log = open(self.path, "a")
+        self._log.write(json.dumps(record) + "\n")
+        self._log.flush()
+
+    def close(self) -> None:
+        self.flush()
+        if self._log is not None:
+            self._log.close()
+            self._log = None
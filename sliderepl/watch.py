@@ -0,0 +1,217 @@
+# sliderepl
+#   Copyright (c) Michael Bayer <mike_mp@zzzcomputing.com>
+#   sliderepl is released under the MIT License:
+#   http://www.opensource.org/licenses/mit-license.php
+"""Reloading a deck as its files are edited, for rehearsals.
+
+With ``--watch``, the deck file and every file it includes are checked
+for changes at each prompt, and every half second while the prompt is
+waiting with nothing typed.  Only the files that changed are parsed
+again; slides from the others are kept as they are.
+
+The new slides are compared with the old.  If the code of a slide
+already run has changed, the slides from that one up to the current
+slide run again, starting from the latest checkpoint before it, and the
+current slide is shown again; ``--watch`` takes pickle checkpoints
+unless ``--checkpoints`` says otherwise.  If only the text of the
+current slide changed, it's shown again without running anything.  A
+change to the setup slide, or to a slide with no checkpoint to start
+from, as with ``--kernel``, reloads the whole deck, as ``!rreallyrerun``
+does.
+
+"""
+from __future__ import annotations
+
+import os
+import signal
+import threading
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+from typing import TYPE_CHECKING
+
+from . import cache
+
+if TYPE_CHECKING:
+    from .core import Deck
+
+try:
+    import readline
+except ImportError:
+    readline = None
+
+
+class _Changed(Exception):
+    """Raised out of input() when the deck changes while waiting."""
+
+
+def _code(slide: Optional[Deck.Slide]) -> Any:
+    if slide is None:
+        return None
+    return (slide.source, slide.never_exec)
+
+
+def _shown(slide: Deck.Slide) -> Tuple:
+    return (
+        _code(slide),
+        slide.title,
+        slide.intro,
+        slide.bullets,
+        slide.no_clear,
+        slide.no_exec,
+        slide.no_echo,
+        slide.has_bullets,
+    )
+
+
+class Watcher:
+    """Notices changes to the files of a deck and reloads it."""
+
+    interval = 0.5
+
+    def __init__(self, deck: Deck):
+        self.deck = deck
+        self._stamps = self._stamp()
+
+    def _stamp(self) -> Dict[str, Any]:
+        stamps: Dict[str, Any] = {}
+        for path in self.deck.source_files:
+            try:
+                stamps[path] = cache.file_stamp(path)
+            except OSError:
+                stamps[path] = None
+        return stamps
+
+    def changed(self) -> List[str]:
+        """Return the files that have changed since the deck was last
+        loaded."""
+
+        return [
+            path
+            for path, stamp in self._stamp().items()
+            if stamp != self._stamps.get(path)
+        ]
+
+    def input(self, prompt: str) -> Optional[str]:
+        """input(), returning None instead once the deck has been
+        reloaded if its files change while waiting."""
+
+        if self.reload():
+            return None
+        if not hasattr(signal, "setitimer") or (
+            threading.current_thread() is not threading.main_thread()
+        ):
+            return input(prompt)
+
+        def poll(signum: int, frame: Any) -> None:
+            # leave a half typed line alone
+            if self.changed() and not (
+                readline and readline.get_line_buffer()
+            ):
+                raise _Changed()
+
+        previous = signal.signal(signal.SIGALRM, poll)
+        signal.setitimer(signal.ITIMER_REAL, self.interval, self.interval)
+        try:
+            return input(prompt)
+        except _Changed:
+            pass
+        finally:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous)
+        print("")
+        self.reload()
+        return None
+
+    def _reparse(self) -> None:
+        deck = self.deck
+        deck._reusable = deck._parsed_files or {}
+        deck._parsed_files = {}
+        deck.slides = []
+        deck.init_slide = None
+        deck.source_files = []
+        try:
+            type(deck)._slides_from_file(deck.path, deck)
+        finally:
+            deck._reusable = {}
+
+    def reload(self) -> bool:
+        """Reload the deck if any of its files have changed, running
+        again whatever slides have to.  Returns True if it was
+        reloaded."""
+
+        changed = self.changed()
+        if not changed:
+            return False
+        deck = self.deck
+        names = ", ".join(os.path.relpath(path) for path in changed)
+        old_slides, old_init = list(deck.slides), deck.init_slide
+        old_files = deck.source_files
+
+        self._stamps = self._stamp()
+        try:
+            self._reparse()
+        except OSError as err:
+            # most likely caught in the middle of a save; tried again
+            # when the file next changes
+            print("%% Couldn't reload %s: %s" % (names, err))
+            deck.slides, deck.init_slide = old_slides, old_init
+            deck.source_files = old_files
+            deck._parsed_files = {}
+            return False
+        self._stamps = self._stamp()
+
+        if _code(old_init) != _code(deck.init_slide):
+            print("%% %s changed, reloading the whole deck" % names)
+            from .core import ReallyRerun
+
+            raise ReallyRerun(deck.current)
+
+        slides = deck.slides
+        first = next(
+            (
+                idx
+                for idx, (old, new) in enumerate(zip(old_slides, slides))
+                if _code(old) != _code(new)
+            ),
+            min(len(old_slides), len(slides)),
+        )
+        del deck._fingerprints[first + 1 :]
+        deck._frames.clear()
+        deck._block_names.clear()
+        deck._behind = [key for key in deck._behind if key[0] <= first]
+        if deck.checkpoints is not None:
+            deck.checkpoints.invalidate(deck)
+
+        deck.current = current = min(deck.current, len(slides))
+        deck.current_top_slide = min(deck.current_top_slide, current)
+        if first < current:
+            if (
+                deck.checkpoints is None
+                or deck.checkpoints.best(deck, first) is None
+            ):
+                # run again on top of what they left behind the first
+                # time, the slides would start from the wrong state
+                print("%% %s changed, reloading the whole deck" % names)
+                from .core import ReallyRerun
+
+                raise ReallyRerun(current)
+            print(
+                "%% %s changed, running slides %d - %d again"
+                % (names, first + 1, current)
+            )
+            deck._rerun_from(first + 1)
+        else:
+            print("%% %s changed" % names)
+            if current and (
+                current > len(old_slides)
+                or _shown(old_slides[current - 1])
+                != _shown(slides[current - 1])
+            ):
+                deck.pending_exec = False
+                deck._do_slide(current, run=False)
+                # it has run already
+                deck._exec_on_return = False
+        return True
@@ -0,0 +1,140 @@
+import os
+
+import pytest
+from sliderepl import cache
+from sliderepl.core import Deck
+
+DECK = """\
+### slide::s
+setup = True
+### slide::b
+### title:: First
+###   * a bullet long enough to be wrapped onto a second line somewhere
+x = 1
+### file:: part.py
+
+### slide::
+print(x)
+### slide::
+"""
+
+PART = """\
+### slide::
+### title:: Included
+y = 2
+### slide::
+"""
+
+
+@pytest.fixture
+def deck_path(tmp_path, monkeypatch):
+    monkeypatch.setenv("SLIDEREPL_CACHE_DIR", str(tmp_path / "cache"))
+    (tmp_path / "part.py").write_text(PART)
+    path = tmp_path / "deck.py"
+    path.write_text(DECK)
+    return path
+
+
+def _touch(path):
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1000000000))
+
+
+def _summary(deck):
+    return [
+        (slide.index, slide.title, slide.source, slide.bullet_markup)
+        for slide in [deck.init_slide] + list(deck.slides)
+    ]
+
+
+def _no_parsing(monkeypatch):
+    def parse(cls, path, deck):
+        raise AssertionError("parsed %s" % path)
+
+    monkeypatch.setattr(Deck, "_slides_from_file", classmethod(parse))
+
+
+def test_miss_then_hit(deck_path, monkeypatch):
+    assert not cache.load(Deck(deck_path))
+    parsed = Deck.from_path(deck_path)
+
+    _no_parsing(monkeypatch)
+    cached = Deck.from_path(deck_path)
+    assert _summary(cached) == _summary(parsed)
+    assert cached.source_files == parsed.source_files
+    assert all(slide.deck is cached for slide in cached.slides)
+
+
+def test_no_cache(deck_path):
+    Deck.from_path(deck_path, no_cache=True)
+    assert not cache.load(Deck(deck_path))
+
+
+def test_changed_file(deck_path):
+    Deck.from_path(deck_path)
+    assert cache.load(Deck(deck_path))
+    _touch(deck_path)
+    assert not cache.load(Deck(deck_path))
+
+
+def test_changed_include(deck_path):
+    Deck.from_path(deck_path)
+    _touch(deck_path.parent / "part.py")
+    assert not cache.load(Deck(deck_path))
+
+    deck = Deck.from_path(deck_path)
+    assert cache.load(Deck(deck_path))
+    assert deck.slides[0].title == "Included"
+
+
+def test_removed_include(deck_path):
+    Deck.from_path(deck_path)
+    os.unlink(deck_path.parent / "part.py")
+    assert not cache.load(Deck(deck_path))
+
+
+def test_keyed_on_options(deck_path):
+    Deck.from_path(deck_path)
+    assert not cache.load(Deck(deck_path, short=True))
+
+
+def test_keyed_on_bullet_width(deck_path):
+    class Narrow(Deck):
+        bullet_width = 20
+
+    Deck.from_path(deck_path)
+    assert not cache.load(Narrow(deck_path))
+
+    narrow = Narrow.from_path(deck_path)
+    assert cache.load(Narrow(deck_path))
+    wide = Deck.from_path(deck_path)
+
+    def lines(deck):
+        markup = deck.slides[1].bullet_markup[0]
+        return "".join(token for _, token in markup.spans).count("\n")
+
+    assert lines(narrow) > lines(wide)
+
+
+def test_keyed_on_config(deck_path, tmp_path):
+    config = tmp_path / "_config.py"
+    config.write_text("bullet_width = 70\n")
+    Deck.from_path(deck_path, config_file=str(config))
+    assert cache.load(Deck(deck_path, config_file=str(config)))
+
+    _touch(config)
+    assert not cache.load(Deck(deck_path, config_file=str(config)))
+
+
+def test_unreadable_entry(deck_path):
+    Deck.from_path(deck_path)
+    for entry in cache.cache_dir().iterdir():
+        entry.write_bytes(b"not a pickle")
+    assert not cache.load(Deck(deck_path))
+    assert Deck.from_path(deck_path).slides[1].title == "First"
+
+
+def test_clear(deck_path):
+    Deck.from_path(deck_path)
+    cache.clear()
+    assert not cache.load(Deck(deck_path))
@@ -0,0 +1,79 @@
+from sliderepl import deps
+
+
+def _plan(sources, needed, always=()):
+    blocks = [
+        (idx, deps.analyze(source), idx in always)
+        for idx, source in enumerate(sources)
+    ]
+    return deps.plan(blocks, needed)
+
+
+def test_assignment():
+    names = deps.analyze("x = y + 1")
+    assert names.binds == {"x"}
+    assert names.reads == {"y"}
+    assert not names.opaque
+
+
+def test_function_body_reads():
+    names = deps.analyze("def f():\n    return helper(x)\n")
+    assert "f" in names.binds
+    assert "helper" not in names.binds
+    assert {"helper", "x"} <= names.reads
+
+
+def test_method_call_binds_receiver():
+    assert "data" in deps.analyze("data.sort()").binds
+    assert "data" in deps.analyze("data[0].append(1)").binds
+
+
+def test_arguments_are_bound():
+    assert "data" in deps.analyze("sorted_inplace(data)").binds
+    assert {"random", "data"} <= deps.analyze("random.shuffle(data)").binds
+    assert {"session", "u"} <= deps.analyze("session.add(u)").binds
+    assert "rows" in deps.analyze("fill(into=rows)").binds
+    assert "items" in deps.analyze("extend(*items)").binds
+    assert "obj" in deps.analyze("reset(obj.attrs)").binds
+
+
+def test_nested_call_doesnt_bind_function():
+    names = deps.analyze("consume(make(data))")
+    assert "data" in names.binds
+    assert "make" not in names.binds
+
+
+def test_opaque():
+    assert deps.analyze("from os import *").opaque
+    assert deps.analyze("exec('x = 1')").opaque
+    assert deps.analyze("globals()['x'] = 1").opaque
+
+
+def test_plan_skips_unrelated():
+    sources = ["x = 1", "y = 2", "z = x + 1"]
+    assert _plan(sources, {"z"}) == [0, 2]
+
+
+def test_plan_follows_reads():
+    sources = ["a = 1", "b = a * 2", "c = 3", "print(c)"]
+    assert _plan(sources, {"b"}) == [0, 1]
+
+
+def test_plan_argument_mutation():
+    sources = [
+        "data = [3, 1, 2]",
+        "def sorted_inplace(seq):\n    seq.sort()\n",
+        "other = 5",
+        "sorted_inplace(data)",
+    ]
+    assert _plan(sources, {"data"}) == [0, 1, 3]
+
+
+def test_plan_always():
+    sources = ["x = 1", "setup_database()", "y = 2"]
+    assert _plan(sources, {"y"}, always={1}) == [1, 2]
+
+
+def test_plan_opaque():
+    sources = ["x = 1", "exec(code)", "y = 2"]
+    assert _plan(sources, {"y"}) == [1, 2]
@@ -0,0 +1,118 @@
+import pytest
+from sliderepl.core import Deck
+
+DECK = """\
+### slide::
+### title:: Before setup
+a = 1
+
+### slide::s
+import os
+
+### slide::b
+### title:: First
+# some intro
+###   * a bullet
+def f(x):
+    return x
+
+
+print(f(a))
+### file:: part.py
+
+### slide::l
+### title:: Long version only
+b = [
+    1,
+    2,
+]
+
+### slide::px
+print("not run")
+### slide::
+"""
+
+PART = """\
+### slide::
+### title:: Included
+# from part.py
+c = {
+    "k": 1,
+}
+### file:: empty.py
+### slide::i
+print(c)
+### slide::
+"""
+
+
+@pytest.fixture
+def deck_path(tmp_path):
+    (tmp_path / "part.py").write_text(PART)
+    (tmp_path / "empty.py").write_text("")
+    path = tmp_path / "deck.py"
+    path.write_text(DECK)
+    return path
+
+
+def _summary(slide):
+    return (
+        slide.index,
+        slide.file,
+        slide.title,
+        slide.intro,
+        slide.bullets,
+        slide.no_exec,
+        slide.never_exec,
+        slide.no_clear,
+        slide.has_bullets,
+        slide.init,
+        slide.source,
+        slide.displays,
+        [slide._line_number(n) for n in range(1, 4)],
+    )
+
+
+@pytest.mark.parametrize("short", [False, True])
+def test_same_slides(deck_path, short):
+    eager = Deck.from_path(deck_path, no_cache=True, short=short)
+    lazy = Deck.from_path(deck_path, no_cache=True, short=short, lazy=True)
+
+    assert len(lazy.slides) == len(eager.slides)
+    assert [_summary(slide) for slide in lazy.slides] == [
+        _summary(slide) for slide in eager.slides
+    ]
+    assert _summary(lazy.init_slide) == _summary(eager.init_slide)
+    assert lazy.source_files == eager.source_files
+
+
+def test_parsed_on_demand(deck_path):
+    deck = Deck.from_path(deck_path, no_cache=True, lazy=True)
+    assert not deck.slides._slides
+    slide = deck.slides[-1]
+    assert slide is deck.slides[len(deck.slides) - 1]
+    assert list(deck.slides._slides) == [len(deck.slides) - 1]
+    assert deck.slides.index(slide) == len(deck.slides) - 1
+    assert deck.slides[1:3] == [deck.slides[1], deck.slides[2]]
+    with pytest.raises(IndexError):
+        deck.slides[len(deck.slides)]
+
+
+def test_validate(deck_path):
+    eager = Deck.from_path(deck_path, no_cache=True, validate=True)
+    lazy = Deck.from_path(deck_path, no_cache=True, lazy=True, validate=True)
+    assert [slide._blocks for slide in lazy.slides] == [
+        slide._blocks for slide in eager.slides
+    ]
+
+
+def test_syntax_error(tmp_path):
+    path = tmp_path / "deck.py"
+    path.write_text("### slide::\nx = 1\n\n### slide::\nx = (\n### slide::\n")
+    eager = Deck.from_path(path, no_cache=True)
+    lazy = Deck.from_path(path, no_cache=True, lazy=True)
+    for deck in (eager, lazy):
+        assert deck._validate()[0][0] is deck.slides[1]
+        deck.slides[1]._split()
+    assert eager.slides[1].error == lazy.slides[1].error
+    assert lazy.slides[1].error.startswith("%s:5: " % path)
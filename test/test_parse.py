@@ -0,0 +1,252 @@
+import textwrap
+
+from sliderepl.core import Deck
+
+DECK = """\
+### slide::s
+import functools
+helpers = {}
+
+### slide::
+### title:: Multi-line statements
+# Statements that span lines are one codeblock,
+# and !!{bullet}styled!!{reset} intro text is kept.
+data = {
+    "a": 1,
+    "b": [
+        2,
+        3,
+    ],
+}
+total = sum(
+    [1, 2, 3]
+)
+print(data, total)
+
+### slide::b
+### title:: Decorators
+###   * a decorated function is one codeblock
+###   * with its **decorators** and ``code``
+def register(fn):
+    helpers[fn.__name__] = fn
+    return fn
+
+
+@register
+@functools.lru_cache()
+def square(x):
+    return x * x
+
+
+class Point:
+    x = 0
+
+    def move(self):
+        self.x += 1
+
+
+print(square(4))
+
+### slide::p
+### title:: Compound statements
+if total > 3:
+    print("big")
+else:
+    print("small")
+for i in range(2):
+    print(i)
+x = 1; y = 2
+print(x + y)
+
+### slide::x
+### title:: Not run
+print("never")
+
+### file:: part.py
+
+### slide::il
+try:
+    1 / 0
+except ZeroDivisionError:
+    print("caught")
+print("done")
+
+
+
+### slide::
+"""
+
+PART = """\
+### slide::
+### title:: Included
+# from another file
+z = [
+    1,
+]
+print(z)
+### slide::
+"""
+
+
+def _deck(tmp_path, **options):
+    (tmp_path / "part.py").write_text(PART)
+    path = tmp_path / "deck.py"
+    path.write_text(DECK)
+    return Deck.from_path(path, no_cache=True, **options)
+
+
+def _blocks(slide):
+    return ["".join(display) for display in slide.displays]
+
+
+def test_setup_slide(tmp_path):
+    deck = _deck(tmp_path)
+    assert deck.init_slide.init
+    assert _blocks(deck.init_slide) == [
+        "import functools\n",
+        "helpers = {}\n\n",
+    ]
+
+
+def test_titles_and_order(tmp_path):
+    deck = _deck(tmp_path)
+    # the slide open when the include is reached comes after the
+    # included slides
+    assert [(slide.index, slide.title) for slide in deck.slides] == [
+        (1, "Multi-line statements"),
+        (2, "Decorators"),
+        (3, "Compound statements"),
+        (4, "Included"),
+        (5, "Not run"),
+        (6, None),
+    ]
+    assert deck.slides[3].file == str(tmp_path / "part.py")
+    assert deck.source_files == [
+        str(tmp_path / "deck.py"),
+        str(tmp_path / "part.py"),
+    ]
+
+
+def test_intro_and_bullets(tmp_path):
+    deck = _deck(tmp_path)
+    assert deck.slides[0].intro == [
+        "Statements that span lines are one codeblock,",
+        "and !!{bullet}styled!!{reset} intro text is kept.",
+    ]
+    assert deck.slides[1].has_bullets
+    assert deck.slides[1].bullets == [
+        "   * a decorated function is one codeblock",
+        "   * with its **decorators** and ``code``",
+    ]
+    assert deck.slides[3].intro == ["from another file"]
+
+
+def test_flags(tmp_path):
+    deck = _deck(tmp_path)
+    assert [
+        (slide.no_exec, slide.never_exec, slide.no_clear)
+        for slide in deck.slides
+    ] == [
+        (False, False, False),
+        (False, False, False),
+        (True, False, False),
+        (False, False, False),
+        (True, True, False),
+        (False, False, True),
+    ]
+
+
+def test_short_presentation(tmp_path):
+    deck = _deck(tmp_path, short=True)
+    assert [slide.title for slide in deck.slides] == [
+        "Multi-line statements",
+        "Decorators",
+        "Compound statements",
+        "Included",
+        "Not run",
+    ]
+
+
+def test_multi_line_statements(tmp_path):
+    deck = _deck(tmp_path)
+    assert _blocks(deck.slides[0]) == [
+        textwrap.dedent(
+            """\
+            data = {
+                "a": 1,
+                "b": [
+                    2,
+                    3,
+                ],
+            }
+            """
+        ),
+        "total = sum(\n    [1, 2, 3]\n)\n",
+        "print(data, total)\n\n",
+    ]
+    assert _blocks(deck.slides[3]) == ["z = [\n    1,\n]\n", "print(z)\n"]
+
+
+def test_decorators(tmp_path):
+    deck = _deck(tmp_path)
+    assert _blocks(deck.slides[1]) == [
+        "def register(fn):\n"
+        "    helpers[fn.__name__] = fn\n"
+        "    return fn\n\n\n",
+        "@register\n"
+        "@functools.lru_cache()\n"
+        "def square(x):\n"
+        "    return x * x\n\n\n",
+        "class Point:\n"
+        "    x = 0\n\n"
+        "    def move(self):\n"
+        "        self.x += 1\n\n\n",
+        "print(square(4))\n\n",
+    ]
+
+
+def test_compound_statements(tmp_path):
+    deck = _deck(tmp_path)
+    assert _blocks(deck.slides[2]) == [
+        'if total > 3:\n    print("big")\nelse:\n    print("small")\n',
+        "for i in range(2):\n    print(i)\n",
+        "x = 1; y = 2\n",
+        "print(x + y)\n\n",
+    ]
+    assert _blocks(deck.slides[5]) == [
+        "try:\n"
+        "    1 / 0\n"
+        "except ZeroDivisionError:\n"
+        '    print("caught")\n',
+        'print("done")\n\n\n\n',
+    ]
+
+
+def test_syntax_error(tmp_path):
+    path = tmp_path / "deck.py"
+    path.write_text("### slide::\nx = (\n### slide::\nprint(1)\n### slide::\n")
+    deck = Deck.from_path(path, no_cache=True)
+    slide = deck.slides[0]
+    assert _blocks(slide) == ["x = (\n"]
+    assert slide.never_exec
+    assert slide.error.startswith("%s:2: " % path)
+    assert _blocks(deck.slides[1]) == ["print(1)\n"]
+
+
+def test_line_numbers(tmp_path):
+    path = tmp_path / "deck.py"
+    path.write_text(
+        "### slide::\n"
+        "a = 1\n"
+        "### slide::\n"
+        "### title:: Gaps\n"
+        "x = (1,\n"
+        "# a comment between lines of code\n"
+        "     2)\n"
+        "print(x)\n"
+        "### slide::\n"
+    )
+    deck = Deck.from_path(path, no_cache=True)
+    slide = deck.slides[1]
+    assert _blocks(slide) == ["x = (1,\n     2)\n", "print(x)\n"]
+    assert [slide._line_number(n) for n in range(1, 4)] == [5, 7, 8]
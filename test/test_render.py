@@ -0,0 +1,92 @@
+from sliderepl import render
+from sliderepl.core import Deck
+
+
+def _text(markup):
+    return "".join(token for _, token in markup.spans)
+
+
+def test_plain_text():
+    markup = render.parse_markup("just text")
+    assert markup.spans == ((None, "just text"),)
+    assert markup.width == 9
+
+
+def test_empty():
+    markup = render.parse_markup("")
+    assert markup.spans == ()
+    assert markup.width == 0
+
+
+def test_directives():
+    markup = render.parse_markup("a !!{bullet}b c!!{reset} d")
+    assert markup.spans == ((None, "a "), ("bullet", "b c"), (None, " d"))
+    assert markup.width == len("a b c d")
+
+
+def test_directive_at_start():
+    markup = render.parse_markup("!!{codebullet}code")
+    assert markup.spans == (("codebullet", "code"),)
+    assert markup.width == 4
+
+
+def test_bullet():
+    markup = render.compile_bullet("   * plain **bold** and ``code``", 70)
+    assert markup.spans == (
+        ("boldbullet", "   • "),
+        ("plain", "plain "),
+        ("boldbullet", "bold"),
+        ("plain", " and "),
+        ("codebullet", "code"),
+    )
+    assert markup.width == len(_text(markup))
+
+
+def test_bullet_directive():
+    markup = render.compile_bullet(
+        "  * see !!{titletext}here!!{reset} now", 70
+    )
+    assert markup.spans == (
+        ("boldbullet", "  • "),
+        ("plain", "see "),
+        ("titletext", "here"),
+        ("plain", " now"),
+    )
+
+
+def test_bullet_wrapping():
+    bullet = "   * " + " ".join(["word"] * 20)
+    markup = render.compile_bullet(bullet, 30)
+    lines = _text(markup).split("\n")
+    assert len(lines) > 1
+    assert lines[0].startswith("   • word")
+    # continuation lines line up under the text of the bullet
+    assert all(line.startswith("     word") for line in lines[1:])
+
+
+def test_bullet_markers_across_lines():
+    bullet = "  * " + "x " * 10 + "**bold " + "y " * 20 + "end**"
+    markup = render.compile_bullet(bullet, 30)
+    bold = "".join(
+        token for style, token in markup.spans if style == "boldbullet"
+    )
+    assert "bold" in bold
+    assert "end" in bold
+    assert "\n" in bold
+
+
+def test_rendered_plain(tmp_path):
+    path = tmp_path / "deck.py"
+    path.write_text(
+        "### slide::b\n"
+        "### title:: The !!{bullet}title\n"
+        "###   * a **bold** point\n"
+        "x = 1\n"
+        "### slide::\n"
+    )
+    deck = Deck.from_path(path, no_cache=True)
+    slide = deck.slides[0]
+    assert slide.title_markup.width == len("*** The title ***")
+    assert deck._render_bullets(slide) == [("   • a bold point\n\n", True)]
+    assert "*** The title ***" in slide._banner()
+    assert "!!{" not in slide._banner()